@@ -1,15 +1,12 @@
 import streamlit as st
 import os
 import json
+import hashlib
+import tempfile
 from datetime import datetime
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import wikipedia
-from gemini_chat import gemini_chat
-from connect import load_all_lectures
-from notes_generator import generate_notes_pdf, generate_notes_word
-from document_extractor import extract_text_from_document
+# Gemini, retrieval (NumPy), document (PyPDF2, docx) and notes (reportlab) modules are
+# imported where they are first used, so the login screen never loads them
 
 # ================== PAGE CONFIG ==================
 st.set_page_config(
@@ -697,6 +694,10 @@ if st.query_params.get("action") == "logout":
     st.session_state.user = None
     st.session_state.role = None
     st.session_state.page = "home"
+    # Chat state belongs to the user who logged out
+    for key in ("messages", "memory", "memory_owner", "chat_user", "current_conversation_id",
+                "document_index", "document_name", "document_hash"):
+        st.session_state.pop(key, None)
 
     # Clear all query params
     st.query_params.clear()
@@ -1072,6 +1073,38 @@ if not st.session_state.logged_in:
 def clean_text(text):
     return re.sub(r"[^\w\s-]", "", text).replace(" ", "_")
 
+# ================== LECTURE RETRIEVAL ==================
+@st.cache_resource(show_spinner=False)
+def get_lecture_index():
+    """Create the subject-sharded lecture index once per process, shared by every session."""
+    from lecture_index import LectureIndex
+    return LectureIndex(BASE_DIR)
+
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache():
+    """Create the near-duplicate question cache once per process, shared by every session."""
+    from semantic_cache import SemanticCache
+    return SemanticCache()
+
+
+def get_user_subjects(user_id):
+    """
+    Get the subject directories a user is enrolled in.
+
+    Args:
+        user_id: User identifier
+
+    Returns:
+        list: Subject directory names, or None if the user has no subject list
+    """
+    with open("users.json") as f:
+        users = json.load(f)
+    subjects = users.get(user_id, {}).get("subjects")
+    if subjects is None:
+        return None
+    return [clean_text(subject) for subject in subjects]
+
 # ================== NOTES GENERATION ==================
 def generate_key_notes(lecture_title, lecture_subject, lecture_transcript):
     """
@@ -1087,6 +1120,8 @@ def generate_key_notes(lecture_title, lecture_subject, lecture_transcript):
     """
     if not lecture_transcript or len(lecture_transcript.strip()) < 100:
         return "No sufficient lecture content available to generate notes."
+
+    from gemini_chat import gemini_chat
     
     prompt = f"""
 You are an expert note-taking assistant. Extract the KEY IMPORTANT POINTS from the following lecture content.
@@ -1109,6 +1144,67 @@ Format the output clearly with headers and bullet points. Make it concise but co
     notes = gemini_chat(prompt)
     return notes
 
+# Bump whenever the generate_key_notes prompt changes, so saved notes are regenerated
+NOTES_PROMPT_VERSION = 1
+
+def notes_cache_path(lecture_path):
+    """Path of the generated-notes file stored next to a lecture."""
+    return lecture_path.rsplit(".", 1)[0] + ".notes.json"
+
+def load_key_notes(lecture_path, lecture_title, lecture_subject):
+    """
+    Get the key notes for a lecture, generating them only when needed.
+    
+    Notes are saved next to the lecture, keyed by the SHA-256 of the
+    transcript and NOTES_PROMPT_VERSION, so the PDF and Word exports and
+    every student reuse one generation until the transcript changes.
+    
+    Args:
+        lecture_path (str): Path of the lecture video/audio file
+        lecture_title (str): Title of the lecture
+        lecture_subject (str): Subject name
+    
+    Returns:
+        str: Key notes formatted for PDF/Word export
+    """
+    # Load lecture transcript
+    transcript_path = lecture_path.rsplit(".", 1)[0] + ".txt"
+    if os.path.exists(transcript_path):
+        with open(transcript_path, "r", encoding="utf-8") as f:
+            transcript = f.read()
+    else:
+        transcript = "Lecture content not available. Please check the transcript file."
+    
+    transcript_hash = hashlib.sha256(transcript.encode("utf-8")).hexdigest()
+    cache_path = notes_cache_path(lecture_path)
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached.get("transcript_sha256") == transcript_hash and cached.get("prompt_version") == NOTES_PROMPT_VERSION:
+            return cached["notes"]
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    # Generate key notes using Gemini AI
+    notes = generate_key_notes(lecture_title, lecture_subject, transcript)
+    
+    from gemini_chat import is_error_reply
+    # Placeholder and error messages are not worth keeping
+    if len(transcript.strip()) < 100 or is_error_reply(notes):
+        return notes
+    
+    # Concurrent exports of the same lecture each write their own temporary file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or ".", suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({
+            "transcript_sha256": transcript_hash,
+            "prompt_version": NOTES_PROMPT_VERSION,
+            "created_at": datetime.now().isoformat(),
+            "notes": notes
+        }, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    return notes
+
 # ================== CHAT HISTORY MANAGEMENT ==================
 def get_chat_history_path(user_id):
     """Get the directory path for storing user chat histories."""
@@ -1116,7 +1212,7 @@ def get_chat_history_path(user_id):
     os.makedirs(chat_history_dir, exist_ok=True)
     return chat_history_dir
 
-def save_chat_conversation(user_id, conversation_id, messages, title=None):
+def save_chat_conversation(user_id, conversation_id, messages, title=None, memory=None):
     """
     Save a conversation to a JSON file.
     
@@ -1125,6 +1221,7 @@ def save_chat_conversation(user_id, conversation_id, messages, title=None):
         conversation_id: Unique ID for the conversation
         messages: List of message dictionaries
         title: Optional title for the conversation
+        memory: Optional ConversationMemory whose summary is stored with the messages
     """
     chat_dir = get_chat_history_path(user_id)
     conversation_file = os.path.join(chat_dir, f"{conversation_id}.json")
@@ -1141,9 +1238,21 @@ def save_chat_conversation(user_id, conversation_id, messages, title=None):
         "last_modified": datetime.now().isoformat(),
         "messages": messages
     }
-    
-    with open(conversation_file, "w", encoding="utf-8") as f:
+    if memory is None:
+        _write_conversation(conversation_file, conversation_data)
+        return
+
+    # The summary worker saves from another thread; write one snapshot at a time
+    with memory.lock:
+        conversation_data["memory"] = memory.to_dict()
+        _write_conversation(conversation_file, conversation_data)
+
+def _write_conversation(conversation_file, conversation_data):
+    # Write to a temporary file first so a reader never sees half a conversation
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(conversation_file), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
         json.dump(conversation_data, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file, conversation_file)
 
 def load_chat_conversation(user_id, conversation_id):
     """
@@ -1217,8 +1326,8 @@ if "page" in st.session_state and st.session_state.page == "chat":
     # Initialize chat session state variables if not already done
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "document_context" not in st.session_state:
-        st.session_state.document_context = None
+    if "document_index" not in st.session_state:
+        st.session_state.document_index = None
     if "document_name" not in st.session_state:
         st.session_state.document_name = None
 
@@ -1348,6 +1457,9 @@ if menu == "📤 Upload Lecture":
                     f"It explains key concepts discussed during the session."
                 )
 
+            # Only this transcript needs re-indexing
+            get_lecture_index().mark_dirty(transcript_path)
+
             st.success("✅ Lecture uploaded successfully!")
             st.balloons()
 
@@ -1410,6 +1522,20 @@ if menu == "📺 View Lectures":
         st.info("📚 No lectures uploaded yet. Staff can upload lectures from the Upload page.")
         st.stop()
 
+    # Search across all lecture transcripts
+    search_query = st.text_input("🔎 Search Lectures", placeholder="e.g., time complexity of merge sort")
+    if search_query:
+        search_results = get_lecture_index().search(
+            search_query,
+            subjects=get_user_subjects(st.session_state.user),
+            top_k=10
+        )
+        if not search_results:
+            st.info("No matching lecture content found.")
+        for result in search_results:
+            with st.expander(f"📄 {os.path.relpath(result['source'], BASE_DIR)}"):
+                st.markdown(result["text"])
+
     # Selectboxes in columns for better layout
     col1, col2 = st.columns(2)
     with col1:
@@ -1486,22 +1612,15 @@ if menu == "📺 View Lectures":
             if st.button("📄 Download as PDF", use_container_width=True, key="download_pdf"):
                 with st.spinner("⏳ Generating PDF notes..."):
                     try:
-                        # Load lecture transcript
-                        transcript_path = st.session_state.current_path.rsplit(".", 1)[0] + ".txt"
-                        if os.path.exists(transcript_path):
-                            with open(transcript_path, "r", encoding="utf-8") as f:
-                                transcript = f.read()
-                        else:
-                            transcript = "Lecture content not available. Please check the transcript file."
-                        
-                        # Generate key notes using Gemini AI
-                        key_notes = generate_key_notes(
+                        # Saved notes are reused; Gemini only runs when the transcript changed
+                        key_notes = load_key_notes(
+                            st.session_state.current_path,
                             lecture_title=lecture.replace(".mp4", "").replace(".mp3", "").replace(".wav", ""),
-                            lecture_subject=subject,
-                            lecture_transcript=transcript
+                            lecture_subject=subject
                         )
                         
                         # Generate PDF
+                        from notes_generator import generate_notes_pdf
                         pdf_content = generate_notes_pdf(
                             lecture_title=lecture.replace(".mp4", "").replace(".mp3", "").replace(".wav", ""),
                             lecture_subject=subject,
@@ -1527,22 +1646,15 @@ if menu == "📺 View Lectures":
             if st.button("📋 Download as Word", use_container_width=True, key="download_word"):
                 with st.spinner("⏳ Generating Word notes..."):
                     try:
-                        # Load lecture transcript
-                        transcript_path = st.session_state.current_path.rsplit(".", 1)[0] + ".txt"
-                        if os.path.exists(transcript_path):
-                            with open(transcript_path, "r", encoding="utf-8") as f:
-                                transcript = f.read()
-                        else:
-                            transcript = "Lecture content not available. Please check the transcript file."
-                        
-                        # Generate key notes using Gemini AI
-                        key_notes = generate_key_notes(
+                        # Saved notes are reused; Gemini only runs when the transcript changed
+                        key_notes = load_key_notes(
+                            st.session_state.current_path,
                             lecture_title=lecture.replace(".mp4", "").replace(".mp3", "").replace(".wav", ""),
-                            lecture_subject=subject,
-                            lecture_transcript=transcript
+                            lecture_subject=subject
                         )
                         
                         # Generate Word document
+                        from notes_generator import generate_notes_word
                         word_content = generate_notes_word(
                             lecture_title=lecture.replace(".mp4", "").replace(".mp3", "").replace(".wav", ""),
                             lecture_subject=subject,
@@ -1572,13 +1684,40 @@ def is_greeting(text):
 
 
 if menu == "🤖 AI Chat":
+    from gemini_chat import gemini_chat_stream
+    from model_router import route
+    from lecture_index import DocumentIndex
+    from context_packer import pack_context, format_section
+    from semantic_cache import context_fingerprint
+    from document_extractor import iter_document_blocks, file_digest
+    from conversation_memory import ConversationMemory
+
+    # A different user on the same browser tab starts with a fresh conversation
+    if st.session_state.get("chat_user") != st.session_state.user:
+        st.session_state.chat_user = st.session_state.user
+        st.session_state.current_conversation_id = generate_conversation_id()
+        st.session_state.messages = []
+    
     # Initialize chat session state variables
     if "current_conversation_id" not in st.session_state:
         st.session_state.current_conversation_id = generate_conversation_id()
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "document_context" not in st.session_state:
-        st.session_state.document_context = None
+    
+    # Memory belongs to one user's conversation; rebuild it whenever that changes
+    memory_owner = (st.session_state.user, st.session_state.current_conversation_id, id(st.session_state.messages))
+    if st.session_state.get("memory_owner") != memory_owner:
+        user_id = st.session_state.user
+        conversation_id = st.session_state.current_conversation_id
+        messages = st.session_state.messages
+        # Background summaries are saved with the conversation as soon as they are ready.
+        # The worker thread cannot read session state, so the owner is bound here.
+        st.session_state.memory = ConversationMemory(
+            on_update=lambda memory: save_chat_conversation(user_id, conversation_id, messages, memory=memory)
+        )
+        st.session_state.memory_owner = memory_owner
+    if "document_index" not in st.session_state:
+        st.session_state.document_index = None
     if "document_name" not in st.session_state:
         st.session_state.document_name = None
     
@@ -1772,7 +1911,7 @@ if menu == "🤖 AI Chat":
     """, unsafe_allow_html=True)
 
     # Display uploaded document info at top if present
-    if st.session_state.document_context:
+    if st.session_state.document_index:
         col1, col2 = st.columns([4, 1])
         with col1:
             st.markdown(f"""
@@ -1782,8 +1921,11 @@ if menu == "🤖 AI Chat":
             """, unsafe_allow_html=True)
         with col2:
             if st.button("❌ Remove", use_container_width=True, key="remove_doc"):
-                st.session_state.document_context = None
+                st.session_state.document_index = None
                 st.session_state.document_name = None
+                # Forget the file so attaching it again is processed, and empty the uploader
+                st.session_state.document_hash = None
+                st.session_state.upload_widget = st.session_state.get("upload_widget", 0) + 1
                 st.rerun()
 
     # Show empty state if no messages
@@ -1814,16 +1956,25 @@ if menu == "🤖 AI Chat":
             "Attach File",
             type=["pdf", "docx", "doc"],
             label_visibility="visible",
-            key="file_upload"
+            key=f"file_upload_{st.session_state.get('upload_widget', 0)}"
         )
         
-        if uploaded_file:
+        uploaded_hash = file_digest(uploaded_file) if uploaded_file else None
+        
+        # Only process a newly attached file, not the same one on every rerun
+        if uploaded_file and uploaded_hash != st.session_state.get("document_hash"):
             with st.spinner("Processing document..."):
                 try:
                     file_ext = uploaded_file.name.split(".")[-1].lower()
-                    extracted_text, filename = extract_text_from_document(uploaded_file, file_ext)
-                    st.session_state.document_context = extracted_text
+                    filename = uploaded_file.name
+                    # Chunk and index once, page by page as the document is extracted;
+                    # questions only retrieve the relevant pages
+                    st.session_state.document_index = DocumentIndex.build(
+                        filename,
+                        iter_document_blocks(uploaded_file, file_ext)
+                    )
                     st.session_state.document_name = filename
+                    st.session_state.document_hash = uploaded_hash
                     st.success(f"✅ {filename} uploaded!")
                 except Exception as e:
                     st.error(f"Error processing file: {str(e)}")
@@ -1840,6 +1991,7 @@ if menu == "🤖 AI Chat":
 
         # ---- ASSISTANT RESPONSE ----
         with st.chat_message("assistant"):
+            streamed = False
 
             # ✅ STEP 0: Greeting shortcut
             if is_greeting(user_input):
@@ -1847,10 +1999,26 @@ if menu == "🤖 AI Chat":
                 source = "🤖 System Response"
 
             else:
-                # Build context with document + lectures
-                document_context = st.session_state.document_context or ""
-                lecture_context = load_all_lectures()
-                
+                # Rank candidate chunks from the document and the lectures,
+                # then keep the best ones within each source's token budget
+                document_results = []
+                if st.session_state.document_index:
+                    document_results = st.session_state.document_index.search(user_input, top_k=20)
+                lecture_results = get_lecture_index().search(
+                    user_input,
+                    subjects=get_user_subjects(st.session_state.user),
+                    top_k=20
+                )
+                packed = pack_context({
+                    "document": document_results,
+                    "lectures": [
+                        {"label": os.path.basename(r["source"]), "text": r["text"], "score": r["score"]}
+                        for r in lecture_results
+                    ]
+                })
+                document_context = format_section(packed["sections"]["document"])
+                lecture_context = format_section(packed["sections"]["lectures"])
+
                 combined_context = ""
                 source = "🌐 Source: External Knowledge (Gemini)"
                 
@@ -1860,35 +2028,56 @@ if menu == "🤖 AI Chat":
                 
                 combined_context += f"CLASSROOM LECTURES:\n{lecture_context}"
 
+                # Earlier turns, bounded: recent ones verbatim and a summary of the rest
+                history = st.session_state.memory.context(st.session_state.messages[:-1])
+                history_section = f"CONVERSATION SO FAR:\n{history}\n\n" if history else ""
+
                 # ✅ STEP 1: Internal check with document + lectures
                 internal_prompt = f"""
 You are Classroom AI.
 
 Answer the question STRICTLY using the content provided below.
 If the answer is not present or insufficient in the provided content, you may use general knowledge.
+Use the conversation so far only to understand what the question refers to.
 
 AVAILABLE CONTENT:
 {combined_context}
 
-QUESTION:
+{history_section}QUESTION:
 {user_input}
 """
 
-                internal_reply = gemini_chat(internal_prompt)
-
                 # Check if answer was found in documents
                 if document_context and st.session_state.document_name:
-                    final_reply = internal_reply
                     source = f"📄 Source: {st.session_state.document_name}"
                 elif lecture_context.strip():
-                    final_reply = internal_reply
                     source = "📘 Source: Classroom Lectures"
                 else:
-                    final_reply = internal_reply
                     source = "🌐 Source: General Knowledge (Gemini)"
 
+                # Reuse the answer to a near-duplicate question asked against the same content
+                semantic_cache = get_semantic_cache()
+                # A follow-up question only means the same thing after the same conversation
+                fingerprint = context_fingerprint(combined_context + history)
+                cached_answer = semantic_cache.lookup(user_input, fingerprint)
+
+                if cached_answer:
+                    final_reply = cached_answer["answer"]
+                    source = f"⚡ Served from cache · {cached_answer['source']}"
+                else:
+                    # Render the answer as it arrives instead of waiting for all of it
+                    # Route on the question and retrieved content, not the instructions wrapped around them
+                    decision = route(internal_prompt, user_input, combined_context)
+                    stream = gemini_chat_stream(internal_prompt, tier=decision.tier)
+                    st.write_stream(stream)
+                    final_reply = stream.text
+                    streamed = True
+                    if not stream.failed:
+                        semantic_cache.store(user_input, fingerprint, final_reply, source)
+
             # ---- DISPLAY ASSISTANT ----
-            st.markdown(final_reply)
+            if not streamed:
+                st.markdown(final_reply)
             st.caption(source)
 
         # ---- SAVE TO SESSION ----
@@ -1901,7 +2090,12 @@ QUESTION:
         )
         
         # Auto-save conversation every time a message is sent
-        save_chat_conversation(st.session_state.user, st.session_state.current_conversation_id, st.session_state.messages)
+        save_chat_conversation(
+            st.session_state.user,
+            st.session_state.current_conversation_id,
+            st.session_state.messages,
+            memory=st.session_state.memory
+        )
 
 # ================== LOGOUT ==================
 st.sidebar.divider()
@@ -0,0 +1,82 @@
+"""
+Notes PDF benchmark: render time against document length.
+
+Renders synthetic notes of increasing length with generate_notes_pdf and
+reports the page count and time per page, which should stay roughly flat
+(linear scaling) up to 50+ pages.
+
+Usage:
+    python bench_notes_pdf.py [--sections 2 10 50 125] [--repeat N]
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+from notes_generator import generate_notes_pdf
+
+_PAGE_PATTERN = re.compile(rb"/Type\s*/Page\b(?!s)")
+
+_WORDS = (
+    "algorithm recursion complexity array pointer graph vertex edge heap stack queue "
+    "sorting merge partition pivot tree balanced hashing collision bucket dynamic "
+    "programming memoization greedy optimal substructure invariant proof induction"
+).split()
+
+
+def synthetic_notes(sections, seed=0):
+    """
+    Build Gemini-style notes with headings, bullets, formulas and paragraphs.
+
+    Args:
+        sections (int): Number of sections (roughly 0.4 pages each)
+        seed (int): Random seed, for repeatable text
+
+    Returns:
+        str: Notes text
+    """
+    rng = random.Random(seed)
+
+    def sentence(words):
+        return " ".join(rng.choice(_WORDS) for _ in range(words)).capitalize() + "."
+
+    lines = []
+    for section in range(1, sections + 1):
+        lines.append(f"## {section}. {sentence(4)[:-1]}")
+        lines.append(" ".join(sentence(14) for _ in range(4)))
+        lines.append("")
+        for _ in range(5):
+            lines.append(f"* **{rng.choice(_WORDS)}**: {sentence(12)}")
+            lines.append(f"  - {sentence(8)}")
+        lines.append(f"T(n) = {rng.randint(2, 8)}T(n/{rng.randint(2, 4)}) + O(n^{rng.randint(1, 3)})")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def count_pages(pdf_bytes):
+    """Count the pages of a rendered PDF."""
+    return len(_PAGE_PATTERN.findall(pdf_bytes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", type=int, nargs="+", default=[2, 10, 50, 125],
+                        help="Note lengths to render, in sections")
+    parser.add_argument("--repeat", type=int, default=3, help="Renders per length; the median is reported")
+    args = parser.parse_args()
+
+    print(f"{'sections':>9}{'pages':>7}{'median ms':>12}{'ms/page':>10}")
+    for sections in args.sections:
+        notes = synthetic_notes(sections)
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            pdf = generate_notes_pdf("Benchmark Lecture", "DAA", notes, "2026-01-16")
+            times.append(time.perf_counter() - start)
+        median = statistics.median(times)
+        pages = count_pages(pdf)
+        print(f"{sections:>9}{pages:>7}{median * 1000:>12.1f}{median * 1000 / max(pages, 1):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
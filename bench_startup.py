@@ -0,0 +1,75 @@
+"""
+Startup benchmark: cold import time of each module app.py may load.
+
+Every module is imported in a fresh interpreter, so the times include all of
+its dependencies, as on the first run of a new Streamlit process.
+
+Usage:
+    python bench_startup.py [--repeat N] [module ...]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+# What the login screen loads, then what other pages load on first use
+LOGIN_MODULES = ["streamlit", "gemini_config"]
+LAZY_MODULES = [
+    "connect",
+    "gemini_chat",
+    "model_router",
+    "context_packer",
+    "lecture_index",
+    "semantic_cache",
+    "document_extractor",
+    "notes_generator",
+    "google.generativeai",
+    "sklearn",
+]
+
+_TIMER = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_time(module):
+    """
+    Measure the cold import time of one module.
+
+    Args:
+        module (str): Dotted module name
+
+    Returns:
+        float: Seconds, or None if the import failed
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMER.format(module=module)],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("modules", nargs="*", help="Modules to time (default: everything app.py uses)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per module; the median is reported")
+    args = parser.parse_args()
+
+    groups = [("custom", args.modules)] if args.modules else [("login", LOGIN_MODULES), ("lazy", LAZY_MODULES)]
+    print(f"{'group':<8}{'module':<24}{'median ms':>12}")
+    for group, modules in groups:
+        total = 0.0
+        for module in modules:
+            times = [import_time(module) for _ in range(args.repeat)]
+            if None in times:
+                print(f"{group:<8}{module:<24}{'failed':>12}")
+                continue
+            median = statistics.median(times)
+            total += median
+            print(f"{group:<8}{module:<24}{median * 1000:>12.1f}")
+        print(f"{group:<8}{'(sum)':<24}{total * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import re
+from array import array
+from collections import namedtuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOP_WORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers him his how i if in into is it its
+itself just me more most my no nor not now of off on once only or other our ours out
+over own same she should so some such than that the their theirs them then there
+these they this those through to too under until up very was we were what when where
+which while who whom why will with would you your yours
+""".split())
+
+
+def tokenize(text):
+    """
+    Lowercase text and split it into search terms, dropping stop words.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        list: List of term strings
+    """
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOP_WORDS]
+
+
+# Term counts of a group of documents (e.g. the chunks of one file), with
+# term ids local to the group: terms[term_ids[i]] occurs tfs[i] times in
+# document doc_ids[i], and lengths holds each document's token count.
+TermPostings = namedtuple("TermPostings", ["terms", "doc_ids", "term_ids", "tfs", "lengths"])
+
+
+def count_terms(token_lists):
+    """
+    Count the terms of already tokenized documents.
+
+    Args:
+        token_lists (list): Terms of each document
+
+    Returns:
+        TermPostings: Counts to pass to BM25Index.from_postings()
+    """
+    terms = {}
+    doc_ids = array("i")
+    term_ids = array("i")
+    tfs = array("i")
+    lengths = array("i")
+    for doc_id, tokens in enumerate(token_lists):
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            doc_ids.append(doc_id)
+            term_ids.append(terms.setdefault(token, len(terms)))
+            tfs.append(count)
+        lengths.append(len(tokens))
+    return TermPostings(
+        list(terms),
+        np.frombuffer(doc_ids, dtype=np.int32),
+        np.frombuffer(term_ids, dtype=np.int32),
+        np.frombuffer(tfs, dtype=np.int32),
+        np.frombuffer(lengths, dtype=np.int32),
+    )
+
+
+def intern_terms(postings, vocab):
+    """
+    Map a group's local term ids to ids in a shared vocabulary.
+
+    Args:
+        postings (TermPostings): Counts from count_terms()
+        vocab (dict): Term -> id, extended in place with new terms
+
+    Returns:
+        numpy.ndarray: int32 vocabulary ids, aligned with postings.term_ids
+    """
+    mapping = np.fromiter(
+        (vocab.setdefault(term, len(vocab)) for term in postings.terms),
+        dtype=np.int32,
+        count=len(postings.terms),
+    )
+    return mapping[postings.term_ids]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over an inverted index.
+
+    Terms are interned to integer ids. While documents are being added each
+    term's postings live in compact array('i') buffers; finalize() packs them
+    into one CSR-style set of NumPy arrays so a query only touches the
+    postings of its own terms.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab = {}
+        self._posting_docs = []
+        self._posting_tfs = []
+        self._lengths = array("i")
+
+        # Packed arrays, built by finalize()
+        self.offsets = None
+        self.doc_ids = None
+        self.tfs = None
+        self.idf = None
+        self.norms = None
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, text):
+        """
+        Add a document to the index.
+
+        Args:
+            text (str): Document text
+
+        Returns:
+            int: The new document id
+        """
+        return self.add_tokens(tokenize(text))
+
+    def add_tokens(self, tokens):
+        """
+        Add an already tokenized document to the index.
+
+        Args:
+            tokens (list): Document terms
+
+        Returns:
+            int: The new document id
+        """
+        doc_id = len(self._lengths)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+
+        for token, count in counts.items():
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                term_id = len(self.vocab)
+                self.vocab[token] = term_id
+                self._posting_docs.append(array("i"))
+                self._posting_tfs.append(array("i"))
+            self._posting_docs[term_id].append(doc_id)
+            self._posting_tfs[term_id].append(count)
+
+        self._lengths.append(len(tokens))
+        self.offsets = None
+        return doc_id
+
+    @classmethod
+    def from_postings(cls, parts, vocab, k1=1.5, b=0.75):
+        """
+        Build a finalized index from precomputed term counts.
+
+        Documents are numbered in order across the parts. The postings are
+        merged with NumPy alone, so rebuilding after one part changed costs
+        far less than re-adding every document. The result takes no further
+        documents.
+
+        Args:
+            parts (list): (TermPostings, vocabulary ids from intern_terms()) pairs
+            vocab (dict): Vocabulary the ids refer to (copied, so it may keep growing)
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalisation
+
+        Returns:
+            BM25Index: The packed index
+        """
+        index = cls(k1, b)
+        index.vocab = dict(vocab)
+        doc_ids, term_ids, tfs, lengths = [], [], [], []
+        n_docs = 0
+        for postings, ids in parts:
+            doc_ids.append(postings.doc_ids + n_docs)
+            term_ids.append(ids)
+            tfs.append(postings.tfs)
+            lengths.append(postings.lengths)
+            n_docs += len(postings.lengths)
+
+        if not parts:
+            index._posting_docs = [array("i") for _ in index.vocab]
+            index._posting_tfs = [array("i") for _ in index.vocab]
+            return index.finalize()
+        doc_ids = np.concatenate(doc_ids).astype(np.int32)
+        term_ids = np.concatenate(term_ids)
+        tfs = np.concatenate(tfs)
+        # Group postings by term; doc ids are already ascending, and a stable sort keeps them so
+        order = np.argsort(term_ids, kind="stable")
+        index._lengths = array("i", np.concatenate(lengths).astype(np.int32).tobytes())
+        sizes = np.bincount(term_ids, minlength=len(index.vocab)).astype(np.int64)
+        index._pack(sizes, doc_ids[order], tfs[order].astype(np.float32))
+        return index
+
+    def finalize(self):
+        """
+        Pack postings into NumPy arrays and precompute IDF and length norms.
+
+        Returns:
+            BM25Index: The index itself, for chaining
+        """
+        sizes = np.fromiter((len(p) for p in self._posting_docs), dtype=np.int64, count=len(self._posting_docs))
+        if self._posting_docs:
+            doc_ids = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in self._posting_docs])
+            tfs = np.concatenate([np.frombuffer(p, dtype=np.int32) for p in self._posting_tfs]).astype(np.float32)
+        else:
+            doc_ids = np.zeros(0, dtype=np.int32)
+            tfs = np.zeros(0, dtype=np.float32)
+        self._pack(sizes, doc_ids, tfs)
+        return self
+
+    def _pack(self, sizes, doc_ids, tfs):
+        # sizes: postings per term id; doc_ids and tfs: postings grouped by term id
+        n_docs = len(self._lengths)
+        self.offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=self.offsets[1:])
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+
+        # BM25 idf, floored at zero so very common terms never count against a match
+        self.idf = np.log1p((n_docs - sizes + 0.5) / (sizes + 0.5)).astype(np.float32)
+
+        lengths = np.frombuffer(self._lengths, dtype=np.int32).astype(np.float32)
+        avg_length = lengths.mean() if n_docs else 0.0
+        if avg_length > 0:
+            self.norms = (self.k1 * (1 - self.b + self.b * lengths / avg_length)).astype(np.float32)
+        else:
+            self.norms = np.full(n_docs, self.k1, dtype=np.float32)
+
+    def search(self, query, top_k=10):
+        """
+        Score documents against a query.
+
+        Args:
+            query (str): Query text
+            top_k (int): Maximum number of results
+
+        Returns:
+            list: (doc_id, score) tuples, best first
+        """
+        if self.offsets is None:
+            self.finalize()
+
+        term_ids = {self.vocab[t] for t in tokenize(query) if t in self.vocab}
+        if not term_ids or top_k <= 0:
+            return []
+
+        scores = np.zeros(len(self._lengths), dtype=np.float32)
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.tfs[start:end]
+            # Doc ids are unique within one posting list, so fancy += is safe
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.norms[docs])
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            best = np.argpartition(scores[candidates], -top_k)[-top_k:]
+            candidates = candidates[best]
+        ranked = candidates[np.argsort(scores[candidates])[::-1]]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in ranked]
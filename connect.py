@@ -1,20 +1,112 @@
 import os
+import threading
 
-def load_all_lectures():
-    lecture_text = ""
-    base_path = "lectures"
+# Uploads are stored here by app.py (BASE_DIR)
+LECTURE_ROOT = "cloud_storage"
 
+# Process-wide corpus cache shared by every Streamlit session:
+# base_path -> (directory signature, corpus text)
+_corpus_cache = {}
+_corpus_lock = threading.Lock()
+
+
+def iter_lecture_files(base_path=LECTURE_ROOT):
+    """
+    Yield the path of every lecture transcript (.txt) under the storage root.
+
+    Args:
+        base_path (str): Root of the lecture storage
+
+    Yields:
+        str: Transcript path, in a stable order
+    """
     if not os.path.exists(base_path):
-        return "No lectures uploaded yet."
+        return
 
     for root, dirs, files in os.walk(base_path):
-        for file in files:
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith(".txt"):
-                with open(os.path.join(root, file), "r", encoding="utf-8") as f:
-                    lecture_text += f"\n\n--- {file} ---\n"
-                    lecture_text += f.read()
+                yield os.path.join(root, file)
+
+
+def iter_lectures(base_path=LECTURE_ROOT):
+    """
+    Stream lecture transcripts one file at a time.
+
+    Args:
+        base_path (str): Root of the lecture storage
+
+    Yields:
+        tuple: (path, text) for each transcript
+    """
+    for path in iter_lecture_files(base_path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                yield path, f.read()
+        except OSError:
+            # Removed between listing and reading
+            continue
+
+
+def _corpus_signature(base_path):
+    # Adding, removing or renaming a file bumps its directory's mtime, so the
+    # directory mtimes identify the corpus without opening any transcript.
+    signature = []
+    for root, dirs, files in os.walk(base_path):
+        dirs.sort()
+        try:
+            signature.append((root, os.stat(root).st_mtime_ns))
+        except OSError:
+            continue
+    return tuple(signature)
+
+
+def invalidate_lectures(base_path=None):
+    """
+    Drop the cached corpus, e.g. after a transcript is uploaded or edited.
+
+    Args:
+        base_path (str): Storage root to invalidate (all roots if None)
+    """
+    with _corpus_lock:
+        if base_path is None:
+            _corpus_cache.clear()
+        else:
+            _corpus_cache.pop(base_path, None)
+
+
+def load_all_lectures(base_path=LECTURE_ROOT):
+    """
+    Load every lecture transcript as one text block.
+
+    The result is cached for the whole process and reused until the storage
+    directories change or invalidate_lectures() is called.
+
+    Args:
+        base_path (str): Root of the lecture storage
+
+    Returns:
+        str: All transcripts, each headed by its file name
+    """
+    if not os.path.exists(base_path):
+        return "No lectures uploaded yet."
+
+    signature = _corpus_signature(base_path)
+    with _corpus_lock:
+        cached = _corpus_cache.get(base_path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    parts = []
+    for path, text in iter_lectures(base_path):
+        parts.append(f"\n\n--- {os.path.basename(path)} ---\n")
+        parts.append(text)
+    lecture_text = "".join(parts)
 
     if lecture_text.strip() == "":
-        return "Lecture files are empty."
+        lecture_text = "Lecture files are empty."
 
+    with _corpus_lock:
+        _corpus_cache[base_path] = (signature, lecture_text)
     return lecture_text
@@ -0,0 +1,139 @@
+import logging
+import re
+from bm25 import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget per context source, in approximate tokens
+DEFAULT_BUDGETS = {
+    "document": 3000,
+    "lectures": 3000,
+}
+
+# Longest paragraph, in words, that fit_to_budget keeps as a single unit
+PARAGRAPH_WORDS = 200
+
+_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def count_tokens(text):
+    """
+    Approximate the number of model tokens in a text.
+
+    Words are counted as one token per ~4 characters and every punctuation
+    mark as one token, which tracks subword tokenizers closely enough for
+    budgeting without loading one.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Approximate token count
+    """
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_PATTERN.findall(text))
+
+
+def score_by_overlap(question, text):
+    """
+    Score a text by how many distinct question terms it contains.
+
+    Args:
+        question (str): The user's question
+        text (str): Candidate context text
+
+    Returns:
+        float: Fraction of question terms present in the text
+    """
+    question_terms = set(tokenize(question))
+    if not question_terms:
+        return 0.0
+    return len(question_terms & set(tokenize(text))) / len(question_terms)
+
+
+def pack_context(candidates, budgets=None):
+    """
+    Fill each source's token budget with its highest-scoring candidates.
+
+    Args:
+        candidates (dict): Source name -> list of dicts with 'label', 'text' and 'score'
+        budgets (dict): Source name -> token budget (DEFAULT_BUDGETS if None)
+
+    Returns:
+        dict: 'sections' (source -> kept candidates, best first),
+              'tokens' (source -> tokens used) and
+              'dropped' (list of dicts with 'source', 'label', 'tokens', 'score')
+    """
+    budgets = budgets or DEFAULT_BUDGETS
+    packed = {"sections": {}, "tokens": {}, "dropped": []}
+
+    for source, items in candidates.items():
+        budget = budgets.get(source, 0)
+        used = 0
+        kept = []
+        for item in sorted(items, key=lambda item: item["score"], reverse=True):
+            tokens = count_tokens(item["text"])
+            if used + tokens <= budget:
+                kept.append(item)
+                used += tokens
+            else:
+                # Keep scanning: a smaller, lower-ranked chunk may still fit
+                packed["dropped"].append({
+                    "source": source,
+                    "label": item["label"],
+                    "tokens": tokens,
+                    "score": item["score"],
+                })
+        packed["sections"][source] = kept
+        packed["tokens"][source] = used
+
+    if packed["dropped"]:
+        logger.info(
+            "Context packer dropped %d chunk(s): %s",
+            len(packed["dropped"]),
+            ", ".join(f"{d['source']}:{d['label']} ({d['tokens']} tokens)" for d in packed["dropped"]),
+        )
+    return packed
+
+
+def format_section(items):
+    """
+    Join packed candidates into prompt text, each headed by its label.
+
+    Args:
+        items (list): Kept candidates from pack_context
+
+    Returns:
+        str: Section text, empty if there are no items
+    """
+    return "\n\n".join(f"--- {item['label']} ---\n{item['text']}" for item in items)
+
+
+def fit_to_budget(question, context, budget):
+    """
+    Trim free-form context to a token budget, keeping the paragraphs most
+    relevant to the question in their original order.
+
+    Args:
+        question (str): The user's question
+        context (str): Context text
+        budget (int): Token budget
+
+    Returns:
+        str: Context that fits the budget
+    """
+    if count_tokens(context) <= budget:
+        return context
+
+    paragraphs = []
+    for paragraph in context.split("\n\n"):
+        words = paragraph.split()
+        # Split oversized paragraphs so one block can never exhaust the budget
+        for start in range(0, len(words), PARAGRAPH_WORDS):
+            paragraphs.append(" ".join(words[start:start + PARAGRAPH_WORDS]))
+    candidates = [
+        {"label": str(i), "text": p, "score": score_by_overlap(question, p)}
+        for i, p in enumerate(paragraphs)
+    ]
+    kept = pack_context({"context": candidates}, {"context": budget})["sections"]["context"]
+    kept.sort(key=lambda item: int(item["label"]))
+    return "\n\n".join(item["text"] for item in kept)
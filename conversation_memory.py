@@ -0,0 +1,156 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from context_packer import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Approximate tokens of recent turns kept verbatim in the prompt
+HISTORY_TOKEN_BUDGET = 800
+
+# Longest rolling summary of older turns, in words
+SUMMARY_MAX_WORDS = 150
+
+# Summaries are written in the background, off the Streamlit script thread
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+
+ROLE_LABELS = {"user": "Student", "assistant": "Classroom AI"}
+
+
+def format_turns(messages):
+    """
+    Render chat messages as a transcript.
+
+    Args:
+        messages (list): Dicts with 'role' and 'content'
+
+    Returns:
+        str: One "Speaker: text" line per message
+    """
+    return "\n".join(
+        f"{ROLE_LABELS.get(message['role'], message['role'])}: {message['content']}"
+        for message in messages
+    )
+
+
+def summarize_turns(summary, messages):
+    """
+    Fold older turns into the rolling summary with the light model.
+
+    Args:
+        summary (str): Summary of the turns before these, or ""
+        messages (list): Turns leaving the recent window
+
+    Returns:
+        str: The new summary, or None if Gemini failed
+    """
+    from gemini_chat import gemini_chat, is_error_reply
+
+    prompt = f"""
+Update the summary of a study conversation between a student and Classroom AI.
+Keep the topics, definitions and facts the student may ask about again, and any
+preferences they stated. Write at most {SUMMARY_MAX_WORDS} words of plain text.
+
+CURRENT SUMMARY:
+{summary or "(none)"}
+
+NEW TURNS:
+{format_turns(messages)}
+
+UPDATED SUMMARY:
+"""
+    reply = gemini_chat(prompt, tier="light")
+    if is_error_reply(reply):
+        return None
+    # Keep the prompt cost bounded even if the model ignores the word limit
+    return " ".join(reply.split()[:SUMMARY_MAX_WORDS])
+
+
+class ConversationMemory:
+    """
+    Bounded memory of one conversation for multi-turn prompts.
+
+    The most recent turns are kept verbatim within a token budget; turns
+    that fall out of that window are folded into a rolling summary in the
+    background. Prompt cost therefore stays constant however long the
+    conversation runs. Turns that left the window while a summary is still
+    being written are missing from the prompt until it finishes.
+    """
+
+    def __init__(self, budget=HISTORY_TOKEN_BUDGET, summarizer=summarize_turns, on_update=None):
+        self.budget = budget
+        self.summarizer = summarizer
+        # Called from the worker thread after the summary changes, e.g. to save it
+        self.on_update = on_update
+        self.summary = ""
+        self.summarized = 0  # Number of leading messages covered by the summary
+        self.lock = threading.RLock()
+        self._pending = None
+
+    def to_dict(self):
+        # Saved with the conversation; nothing reads it back yet, since saved
+        # conversations are never reopened
+        with self.lock:
+            return {"summary": self.summary, "summarized": self.summarized}
+
+    def _window_start(self, messages):
+        # Walk back from the newest turn until the token budget is spent
+        used = 0
+        start = len(messages)
+        while start > self.summarized:
+            tokens = count_tokens(messages[start - 1]["content"])
+            if used + tokens > self.budget:
+                break
+            used += tokens
+            start -= 1
+        return start
+
+    def context(self, messages):
+        """
+        Build the conversation section of the next prompt.
+
+        Also starts a background summary of turns that no longer fit the
+        window.
+
+        Args:
+            messages (list): Earlier messages, oldest first, without the new question
+
+        Returns:
+            str: Summary and recent turns, or "" for a new conversation
+        """
+        with self.lock:
+            start = self._window_start(messages)
+            if start > self.summarized:
+                self._summarize(messages[self.summarized:start], start)
+            summary = self.summary
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier conversation:\n{summary}")
+        if start < len(messages):
+            parts.append(f"Recent conversation:\n{format_turns(messages[start:])}")
+        return "\n\n".join(parts)
+
+    def _summarize(self, messages, end):
+        # One summary at a time; later overflow is picked up by the next call
+        if self._pending is not None and not self._pending.done():
+            return
+        self._pending = _summary_executor.submit(self._update_summary, self.summary, list(messages), end)
+
+    def _update_summary(self, summary, messages, end):
+        try:
+            new_summary = self.summarizer(summary, messages)
+        except Exception:
+            logger.exception("Conversation summary failed")
+            return
+        if new_summary is None:
+            return
+        with self.lock:
+            self.summary = new_summary
+            self.summarized = end
+        logger.info("Summarized %d turn(s) of conversation history", len(messages))
+        if self.on_update is not None:
+            try:
+                self.on_update(self)
+            except Exception:
+                logger.exception("Saving the conversation summary failed")
@@ -1,54 +1,277 @@
 from PyPDF2 import PdfReader
 from docx import Document
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
+import multiprocessing
 import os
+import re
+import tempfile
+import threading
 
-def extract_text_from_pdf(pdf_file):
+# Extracted text cached by SHA-256 of the file bytes
+EXTRACTION_CACHE_DIR = "extraction_cache"
+MAX_CACHED_EXTRACTIONS = 32
+
+# Extracted PDF pages cached by SHA-256 of each page's content stream and resources
+PAGE_CACHE_DIR = os.path.join(EXTRACTION_CACHE_DIR, "pages")
+MAX_CACHED_PAGES = 4096
+
+# PDFs with fewer pages are extracted serially; process start-up would cost more than it saves
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 16
+MAX_WORKERS = os.cpu_count() or 1
+
+# Workers never fork the multi-threaded Streamlit process: a forked child can
+# deadlock on a lock another thread held at fork time
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Page markers separating pages in extracted PDF text
+PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+
+# Separates Word paragraphs in cached text. Paragraphs may contain "\n" (line
+# breaks), but never this control character, which XML 1.0 does not allow
+PARAGRAPH_SEPARATOR = "\x1e"
+
+# One unit of streamed extraction: a PDF page (paragraph is None) or a Word
+# paragraph (page is None). digest identifies a PDF page's content stream.
+ExtractedBlock = namedtuple("ExtractedBlock", ["page", "paragraph", "text", "digest"], defaults=[None])
+
+_extraction_cache = OrderedDict()
+_extraction_lock = threading.Lock()
+
+_page_cache = OrderedDict()
+_page_lock = threading.Lock()
+
+# The PDF parsed by this worker process (set by _init_worker)
+_worker_reader = None
+
+def _object_digest(obj, memo):
+    # Digest of a PDF object with every indirect reference resolved, so two
+    # documents only match when what the page draws with is really the same
+    if hasattr(obj, "idnum"):
+        key = (obj.idnum, obj.generation)
+        if key not in memo:
+            memo[key] = b"cycle"
+            memo[key] = _object_digest(obj.get_object(), memo)
+        return memo[key]
+    
+    h = hashlib.sha256()
+    if isinstance(obj, dict):
+        h.update(b"stream" if hasattr(obj, "get_data") else b"dict")
+        for name in sorted(obj):
+            if name in ("/Parent", "/Length"):
+                continue
+            h.update(name.encode("utf-8", "surrogateescape"))
+            h.update(_object_digest(obj[name], memo))
+        # Image data never affects the extracted text
+        if hasattr(obj, "get_data") and obj.get("/Subtype") != "/Image":
+            try:
+                h.update(obj.get_data())
+            except Exception:
+                h.update(obj._data)
+    elif isinstance(obj, list):
+        h.update(b"array")
+        for item in obj:
+            h.update(_object_digest(item, memo))
+    else:
+        h.update(repr(obj).encode("utf-8", "surrogateescape"))
+    return h.digest()
+
+
+def page_digest(page, memo=None):
+    """
+    Compute the SHA-256 digest identifying a PDF page's text.
+    
+    Covers the content stream and the page's resolved /Resources (fonts with
+    their encodings and ToUnicode maps, form XObjects), since identical
+    content streams can draw different text through same-named resources.
+    
+    Args:
+        page: PyPDF2 page object
+        memo (dict): Digests of indirect objects already seen in the same
+            document, so shared fonts are hashed once per document
+    
+    Returns:
+        str: Hex digest
+    """
+    contents = page.get_contents()
+    h = hashlib.sha256(contents.get_data() if contents is not None else b"")
+    h.update(_object_digest(page.get("/Resources"), {} if memo is None else memo))
+    h.update(repr(page.get("/Rotate", 0)).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _page_cache_get(digest):
+    with _page_lock:
+        if digest in _page_cache:
+            _page_cache.move_to_end(digest)
+            return _page_cache[digest]
+
+    path = os.path.join(PAGE_CACHE_DIR, f"{digest}.txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        _page_cache_put(digest, text, persist=False)
+        return text
+    return None
+
+
+def _page_cache_put(digest, text, persist=True):
+    with _page_lock:
+        _page_cache[digest] = text
+        _page_cache.move_to_end(digest)
+        while len(_page_cache) > MAX_CACHED_PAGES:
+            _page_cache.popitem(last=False)
+
+    if persist:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        path = os.path.join(PAGE_CACHE_DIR, f"{digest}.txt")
+        fd, tmp_path = tempfile.mkstemp(dir=PAGE_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+def _page_cache_has(digest):
+    # Checks the cache without reading the page text
+    with _page_lock:
+        if digest in _page_cache:
+            return True
+    return os.path.exists(os.path.join(PAGE_CACHE_DIR, f"{digest}.txt"))
+
+
+def _extract_page(page, digest):
+    # Only pages whose content stream has not been seen before are parsed
+    text = _page_cache_get(digest)
+    if text is None:
+        text = page.extract_text() or ""
+        _page_cache_put(digest, text)
+    return text
+
+
+def _init_worker(pdf_bytes):
+    # Runs once per worker process, so the PDF is sent to each worker once rather than with every batch
+    global _worker_reader
+    _worker_reader = PdfReader(io.BytesIO(pdf_bytes))
+
+
+def _extract_page_list(indices):
+    # Runs in a worker process set up by _init_worker
+    return [_worker_reader.pages[i].extract_text() or "" for i in indices]
+
+
+def extract_text_from_pdf(pdf_file, parallel=None):
     """
     Extract text from a PDF file.
     
+    Pages are cached by the hash of their content and resources, so a revised
+    document only re-extracts the pages that changed. When many pages need
+    extracting they are split into batches on a process pool; otherwise they
+    are extracted serially.
+    
     Args:
         pdf_file: File object or path to PDF file
+        parallel (bool): Force (True) or disable (False) parallel extraction;
+            by default it is used from PARALLEL_MIN_PAGES uncached pages upwards
     
     Returns:
         str: Extracted text from PDF
     """
     try:
-        reader = PdfReader(pdf_file)
-        text = ""
-        for page_num in range(len(reader.pages)):
-            page = reader.pages[page_num]
-            text += f"\n--- Page {page_num + 1} ---\n"
-            text += page.extract_text()
-        return text.strip()
+        parts = []
+        for block in iter_pdf_pages(pdf_file, parallel):
+            parts.append(f"\n--- Page {block.page} ---\n")
+            parts.append(block.text)
+        return "".join(parts).strip()
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
 
-def extract_text_from_word(docx_file):
+def extract_text_from_word(docx_file, separator="\n"):
     """
     Extract text from a Word document.
     
     Args:
         docx_file: File object or path to DOCX file
+        separator (str): Text placed between paragraphs
     
     Returns:
         str: Extracted text from Word document
     """
     try:
-        doc = Document(docx_file)
-        text = ""
-        for para in doc.paragraphs:
-            if para.text.strip():
-                text += para.text + "\n"
-        return text.strip()
+        return separator.join(block.text for block in iter_docx_paragraphs(docx_file)).strip()
     except Exception as e:
         raise Exception(f"Error extracting text from Word document: {str(e)}")
 
 
+def _read_bytes(file):
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    data = file.read()
+    file.seek(0)
+    return data
+
+
+def file_digest(file):
+    """
+    Compute the SHA-256 digest of a file's contents.
+    
+    Args:
+        file: Uploaded file object
+    
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.sha256(_read_bytes(file)).hexdigest()
+
+
+def _cache_key(digest, file_type):
+    # Word documents are cached as PARAGRAPH_SEPARATOR-joined paragraphs, under
+    # their own name so text cached in the older newline layout is not misread
+    return digest if file_type == 'pdf' else f"{digest}.paragraphs"
+
+
+def _cache_get(key):
+    with _extraction_lock:
+        if key in _extraction_cache:
+            _extraction_cache.move_to_end(key)
+            return _extraction_cache[key]
+
+    path = os.path.join(EXTRACTION_CACHE_DIR, f"{key}.txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read().strip()
+        _cache_put(key, text, persist=False)
+        return text
+    return None
+
+
+def _cache_put(key, text, persist=True):
+    with _extraction_lock:
+        _extraction_cache[key] = text
+        _extraction_cache.move_to_end(key)
+        while len(_extraction_cache) > MAX_CACHED_EXTRACTIONS:
+            _extraction_cache.popitem(last=False)
+
+    if persist:
+        os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+        path = os.path.join(EXTRACTION_CACHE_DIR, f"{key}.txt")
+        # Concurrent sessions extracting the same file each write their own temp file
+        fd, tmp_path = tempfile.mkstemp(dir=EXTRACTION_CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
 def extract_text_from_document(file, file_type):
     """
     Extract text from either PDF or Word document based on file type.
     
+    Results are cached by the SHA-256 of the file bytes, in memory (LRU) and
+    on disk, so the same file is only ever parsed once.
+    
     Args:
         file: Uploaded file object
         file_type: Type of file ('pdf' or 'docx')
@@ -57,12 +280,174 @@ def extract_text_from_document(file, file_type):
         tuple: (extracted_text, filename)
     """
     filename = file.name
+    file_type = file_type.lower()
+    
+    if file_type not in ['pdf', 'docx', 'doc']:
+        raise ValueError(f"Unsupported file type: {file_type}")
+    
+    data = _read_bytes(file)
+    key = _cache_key(hashlib.sha256(data).hexdigest(), file_type)
+    extracted_text = _cache_get(key)
+    if extracted_text is None:
+        if file_type == 'pdf':
+            extracted_text = extract_text_from_pdf(io.BytesIO(data))
+        else:
+            extracted_text = extract_text_from_word(io.BytesIO(data), PARAGRAPH_SEPARATOR)
+        _cache_put(key, extracted_text)
     
-    if file_type.lower() == 'pdf':
-        extracted_text = extract_text_from_pdf(file)
-    elif file_type.lower() in ['docx', 'doc']:
-        extracted_text = extract_text_from_word(file)
+    return extracted_text.replace(PARAGRAPH_SEPARATOR, "\n"), filename
+
+
+def iter_pdf_pages(pdf_file, parallel=None):
+    """
+    Lazily extract a PDF one page at a time.
+    
+    Cached pages are served from the page cache. When many pages are
+    uncached they are extracted in batches on a process pool, like
+    extract_text_from_pdf, and still yielded in page order as their batches
+    finish. Serial extraction digests each page only when it is reached, so
+    the first page is yielded without walking the rest of the document.
+    
+    Args:
+        pdf_file: File object or path to PDF file
+        parallel (bool): Force (True) or disable (False) parallel extraction;
+            by default it is used from PARALLEL_MIN_PAGES uncached pages upwards
+    
+    Yields:
+        ExtractedBlock: (page number, None, page text, content digest)
+    """
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            pdf_bytes = f.read()
     else:
+        pdf_bytes = _read_bytes(pdf_file)
+    
+    reader = PdfReader(io.BytesIO(pdf_bytes))
+    pages = reader.pages
+    memo = {}
+    digests = None
+    if parallel or (parallel is None and len(pages) >= PARALLEL_MIN_PAGES and MAX_WORKERS > 1):
+        # Only a document that may go to the process pool is digested up front,
+        # to find which pages need extracting
+        digests = [page_digest(page, memo) for page in pages]
+        missing = [i for i, digest in enumerate(digests) if not _page_cache_has(digest)]
+        if parallel is None:
+            parallel = len(missing) >= PARALLEL_MIN_PAGES
+    
+    next_page = 0
+    if parallel and len(missing) > 1:
+        batches = [missing[i:i + PAGES_PER_TASK] for i in range(0, len(missing), PAGES_PER_TASK)]
+        pool = None
+        try:
+            pool = ProcessPoolExecutor(
+                max_workers=min(MAX_WORKERS, len(batches)),
+                mp_context=multiprocessing.get_context(START_METHOD),
+                initializer=_init_worker,
+                initargs=(pdf_bytes,),
+            )
+            futures = [pool.submit(_extract_page_list, batch) for batch in batches]
+            batch_of = {page: (future, batch.index(page)) for future, batch in zip(futures, batches) for page in batch}
+            for i, digest in enumerate(digests):
+                if i in batch_of:
+                    future, position = batch_of[i]
+                    text = future.result()[position]
+                    _page_cache_put(digest, text)
+                else:
+                    text = _extract_page(pages[i], digest)
+                yield ExtractedBlock(i + 1, None, text, digest)
+                next_page = i + 1
+        except (OSError, RuntimeError):
+            # No usable process pool (e.g. restricted host): finish serially
+            pass
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+    
+    for i in range(next_page, len(pages)):
+        digest = digests[i] if digests is not None else page_digest(pages[i], memo)
+        yield ExtractedBlock(i + 1, None, _extract_page(pages[i], digest), digest)
+
+
+def iter_docx_paragraphs(docx_file):
+    """
+    Lazily extract the non-empty paragraphs of a Word document.
+    
+    Args:
+        docx_file: File object or path to DOCX file
+    
+    Yields:
+        ExtractedBlock: (None, paragraph index, paragraph text)
+    """
+    doc = Document(docx_file)
+    index = 0
+    for para in doc.paragraphs:
+        if para.text.strip():
+            yield ExtractedBlock(None, index, para.text)
+            index += 1
+
+
+def _iter_text_blocks(text, file_type):
+    # Rebuild blocks from cached extraction output
+    if file_type == 'pdf':
+        markers = list(PAGE_MARKER.finditer(text))
+        for i, marker in enumerate(markers):
+            end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+            yield ExtractedBlock(int(marker.group(1)), None, text[marker.end():end].strip("\n"))
+    else:
+        paragraphs = (p for p in text.split(PARAGRAPH_SEPARATOR) if p.strip())
+        for index, paragraph in enumerate(paragraphs):
+            yield ExtractedBlock(None, index, paragraph)
+
+
+def iter_document_blocks(file, file_type):
+    """
+    Stream a PDF or Word document as pages or paragraphs.
+    
+    Cached documents are replayed from the extraction cache. Otherwise blocks
+    are yielded as they are extracted and written straight to the on-disk
+    cache, so memory is bounded by a single page rather than the document.
+    
+    Args:
+        file: Uploaded file object
+        file_type: Type of file ('pdf' or 'docx')
+    
+    Yields:
+        ExtractedBlock: Extracted pages (PDF) or paragraphs (Word)
+    """
+    file_type = file_type.lower()
+    if file_type not in ['pdf', 'docx', 'doc']:
         raise ValueError(f"Unsupported file type: {file_type}")
     
-    return extracted_text, filename
+    data = _read_bytes(file)
+    key = _cache_key(hashlib.sha256(data).hexdigest(), file_type)
+    cached_text = _cache_get(key)
+    if cached_text is not None:
+        yield from _iter_text_blocks(cached_text, file_type)
+        return
+    
+    if file_type == 'pdf':
+        blocks = iter_pdf_pages(io.BytesIO(data))
+    else:
+        blocks = iter_docx_paragraphs(io.BytesIO(data))
+    
+    os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+    path = os.path.join(EXTRACTION_CACHE_DIR, f"{key}.txt")
+    fd, tmp_path = tempfile.mkstemp(dir=EXTRACTION_CACHE_DIR, suffix=".tmp")
+    completed = False
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as cache_file:
+            for block in blocks:
+                # Same layout as extract_text_from_pdf / extract_text_from_word
+                if block.page is not None:
+                    prefix = "\n" if block.page > 1 else ""
+                    cache_file.write(f"{prefix}--- Page {block.page} ---\n{block.text}")
+                else:
+                    cache_file.write(f"{block.text}{PARAGRAPH_SEPARATOR}")
+                yield block
+        completed = True
+    finally:
+        # Only a fully extracted document is committed to the cache
+        if completed:
+            os.replace(tmp_path, path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
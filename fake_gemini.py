@@ -0,0 +1,204 @@
+"""
+Deterministic local stand-in for google.generativeai.GenerativeModel.
+
+Selected with GEMINI_BACKEND=fake so benchmarks and load tests run offline.
+It implements the part of the model interface the app uses:
+
+    generate_content(prompt, stream=False, request_options=None) -> response
+    await generate_content_async(prompt)   -> response
+
+Responses have .parts, .text, .usage_metadata and, when streamed, iterate
+over chunks with the same attributes. Behaviour is configured with
+environment variables:
+
+    FAKE_GEMINI_LATENCY          fixed:S | uniform:A,B | lognormal:MU,SIGMA | exponential:MEAN
+    FAKE_GEMINI_CHUNK_DELAY      seconds between streamed chunks
+    FAKE_GEMINI_CHUNK_WORDS      words per streamed chunk
+    FAKE_GEMINI_ANSWER_WORDS     length of each answer
+    FAKE_GEMINI_BLOCK_RATE       fraction of responses blocked by safety filters
+    FAKE_GEMINI_RATE_LIMIT_RATE  fraction of calls failing with ResourceExhausted
+    FAKE_GEMINI_EMPTY_RATE       fraction of responses with no content
+    FAKE_GEMINI_SEED             seed for all random choices
+
+A request_options={"timeout": S} shorter than the sampled latency fails with
+DeadlineExceeded after S seconds, like the live API.
+
+A prompt containing [[fake:blocked]], [[fake:rate_limited]] or [[fake:empty]]
+always gets that outcome. The same prompt asked the n-th time always gets
+the same latency, outcome and answer, whatever the interleaving of calls.
+"""
+import asyncio
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict, namedtuple
+from context_packer import count_tokens
+
+OUTCOMES = ("blocked", "rate_limited", "empty")
+
+_FORCED_PATTERN = re.compile(r"\[\[fake:(blocked|rate_limited|empty)\]\]")
+_WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z-]{2,}")
+
+UsageMetadata = namedtuple("UsageMetadata", ["prompt_token_count", "candidates_token_count", "total_token_count"])
+
+
+class ResourceExhausted(Exception):
+    """Mirrors google.api_core.exceptions.ResourceExhausted (HTTP 429)."""
+
+
+class DeadlineExceeded(Exception):
+    """Mirrors google.api_core.exceptions.DeadlineExceeded (HTTP 504)."""
+
+
+def parse_latency(spec):
+    """
+    Parse a latency distribution.
+
+    Args:
+        spec (str): 'fixed:S', 'uniform:A,B', 'lognormal:MU,SIGMA' or 'exponential:MEAN' (seconds)
+
+    Returns:
+        function: Takes a random.Random and returns a latency in seconds
+    """
+    kind, _, args = spec.partition(":")
+    values = [float(value) for value in args.split(",") if value.strip()]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Invalid FAKE_GEMINI_LATENCY: {spec!r}")
+
+
+class FakeResponse:
+    """A complete or streamed response, shaped like the google.generativeai one."""
+
+    def __init__(self, text, prompt_tokens, blocked=False, chunks=None, chunk_delay=0.0):
+        self._text = text
+        self._blocked = blocked
+        self._chunks = chunks
+        self._chunk_delay = chunk_delay
+        self.parts = [text] if text else []
+        answer_tokens = count_tokens(text)
+        self.usage_metadata = UsageMetadata(prompt_tokens, answer_tokens, prompt_tokens + answer_tokens)
+
+    @property
+    def text(self):
+        if not self.parts:
+            # google.generativeai raises the same way for blocked and empty candidates
+            reason = "SAFETY" if self._blocked else "STOP"
+            raise ValueError(f"The response has no parts (finish_reason: {reason})")
+        return self._text
+
+    def __iter__(self):
+        if self._chunks is None:
+            raise TypeError("Only streamed responses (stream=True) can be iterated")
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_delay:
+                time.sleep(self._chunk_delay)
+            yield FakeResponse(chunk, 0)
+
+
+class FakeGenerativeModel:
+    """Offline model with seeded latency, answers and failures."""
+
+    def __init__(self, model_name, generation_config=None, latency="lognormal:-0.7,0.5",
+                 chunk_delay=0.02, chunk_words=8, answer_words=120,
+                 block_rate=0.0, rate_limit_rate=0.0, empty_rate=0.0, seed=0, sleep=time.sleep):
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.latency = parse_latency(latency)
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.answer_words = answer_words
+        self.rates = {"blocked": block_rate, "rate_limited": rate_limit_rate, "empty": empty_rate}
+        self.seed = seed
+        self.calls = 0
+        self._sleep = sleep
+        self._seen = defaultdict(int)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, model_name, generation_config=None):
+        """Create a model configured by the FAKE_GEMINI_* environment variables."""
+        env = os.environ
+        return cls(
+            model_name,
+            generation_config,
+            latency=env.get("FAKE_GEMINI_LATENCY", "lognormal:-0.7,0.5"),
+            chunk_delay=float(env.get("FAKE_GEMINI_CHUNK_DELAY", 0.02)),
+            chunk_words=int(env.get("FAKE_GEMINI_CHUNK_WORDS", 8)),
+            answer_words=int(env.get("FAKE_GEMINI_ANSWER_WORDS", 120)),
+            block_rate=float(env.get("FAKE_GEMINI_BLOCK_RATE", 0)),
+            rate_limit_rate=float(env.get("FAKE_GEMINI_RATE_LIMIT_RATE", 0)),
+            empty_rate=float(env.get("FAKE_GEMINI_EMPTY_RATE", 0)),
+            seed=int(env.get("FAKE_GEMINI_SEED", 0)),
+        )
+
+    def _plan(self, prompt):
+        # One RNG per (prompt, repetition), so concurrency cannot change what a call gets
+        digest = hashlib.sha256(f"{self.seed}:{self.model_name}:{prompt}".encode("utf-8")).hexdigest()
+        with self._lock:
+            self.calls += 1
+            repetition = self._seen[digest]
+            self._seen[digest] += 1
+        rng = random.Random(f"{digest}:{repetition}")
+
+        latency = max(0.0, self.latency(rng))
+        forced = _FORCED_PATTERN.search(prompt)
+        if forced:
+            return latency, forced.group(1), rng
+        draw = rng.random()
+        for outcome in OUTCOMES:
+            if draw < self.rates[outcome]:
+                return latency, outcome, rng
+            draw -= self.rates[outcome]
+        return latency, None, rng
+
+    def _answer(self, prompt, rng):
+        vocabulary = _WORD_PATTERN.findall(prompt) or ["lecture", "concept", "example"]
+        words = [rng.choice(vocabulary) for _ in range(self.answer_words)]
+        lines = [f"📘 {' '.join(words[:4]).title()}"]
+        for i in range(4, len(words), 12):
+            lines.append("• " + " ".join(words[i:i + 12]))
+        return "\n".join(lines)
+
+    def _respond(self, prompt, outcome, rng, stream):
+        prompt_tokens = count_tokens(prompt)
+        if outcome == "rate_limited":
+            raise ResourceExhausted("429 Quota exceeded (fake backend)")
+        if outcome in ("blocked", "empty"):
+            return FakeResponse("", prompt_tokens, blocked=outcome == "blocked", chunks=[] if stream else None)
+
+        text = self._answer(prompt, rng)
+        chunks = None
+        if stream:
+            # Split on spaces so the chunks join back to exactly the full text
+            words = text.split(" ")
+            chunks = [
+                " ".join(words[i:i + self.chunk_words]) + (" " if i + self.chunk_words < len(words) else "")
+                for i in range(0, len(words), self.chunk_words)
+            ]
+        return FakeResponse(text, prompt_tokens, chunks=chunks, chunk_delay=self.chunk_delay)
+
+    def generate_content(self, prompt, stream=False, request_options=None):
+        """Answer after the sampled latency (time to first chunk when streaming)."""
+        latency, outcome, rng = self._plan(prompt)
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and latency > timeout:
+            self._sleep(timeout)
+            raise DeadlineExceeded("504 Deadline Exceeded (fake backend)")
+        self._sleep(latency)
+        return self._respond(prompt, outcome, rng, stream)
+
+    async def generate_content_async(self, prompt):
+        """Async variant of generate_content()."""
+        latency, outcome, rng = self._plan(prompt)
+        await asyncio.sleep(latency)
+        return self._respond(prompt, outcome, rng, False)
@@ -1,15 +1,106 @@
-from gemini_config import client
+import asyncio
+import itertools
+import time
+import weakref
+from gemini_config import (
+    get_client,
+    MODEL_TIERS,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_DB,
+    RESPONSE_CACHE_TTL,
+    MAX_CONCURRENT_REQUESTS,
+    RATE_LIMIT_REQUESTS_PER_MINUTE,
+    RATE_LIMIT_TOKENS_PER_MINUTE,
+    RATE_LIMIT_MAX_WAIT,
+    MAX_RETRIES,
+    RETRY_BASE_DELAY,
+    RETRY_MAX_DELAY,
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_RESET_TIMEOUT,
+    REQUEST_DEADLINE,
+    STREAM_FIRST_CHUNK_DEADLINE,
+    HEDGING_ENABLED,
+    HEDGE_PERCENTILE,
+    HEDGE_MAX_FRACTION,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_MIN_DELAY,
+)
+from context_packer import DEFAULT_BUDGETS, count_tokens, fit_to_budget
+from response_cache import ResponseCache, make_key
+from hedging import DeadlineExceededError, Hedger
+from single_flight import SingleFlight
+from model_router import route
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiter,
+    RateLimitError,
+    call_with_resilience,
+    call_with_resilience_async,
+    is_rate_limited,
+    is_retryable,
+    is_timeout,
+)
 
-def gemini_chat(question, lecture_context=None):
+# Shared by every session in the process
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_DB, RESPONSE_CACHE_TTL)
+
+# Process-wide protection of the upstream API
+rate_limiter = RateLimiter(RATE_LIMIT_REQUESTS_PER_MINUTE, RATE_LIMIT_TOKENS_PER_MINUTE, RATE_LIMIT_MAX_WAIT)
+circuit_breaker = CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+hedger = Hedger(HEDGE_PERCENTILE, HEDGE_MAX_FRACTION, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY)
+# Streams are hedged on time to first chunk, a different latency distribution
+stream_hedger = Hedger(HEDGE_PERCENTILE, HEDGE_MAX_FRACTION, HEDGE_MIN_SAMPLES, HEDGE_MIN_DELAY)
+
+# Concurrent identical prompts (e.g. a class exporting the same notes) share one call
+single_flight = SingleFlight()
+
+# asyncio semaphores are bound to one event loop, so keep one per loop
+_loop_semaphores = weakref.WeakKeyDictionary()
+
+# Replies returned instead of an answer when the API call fails
+EMPTY_RESPONSE_MESSAGE = "I couldn't generate a response. This might be due to content filtering or API limitations. Please try again with a different question."
+FILTERED_RESPONSE_MESSAGE = "The API returned an empty response. This could mean:\n• Your question was filtered by safety systems\n• API rate limit exceeded\n• Please try rephrasing your question or try again later."
+UNAVAILABLE_MESSAGE = "Classroom AI is temporarily unavailable because the Gemini API is not responding. Please try again in a minute."
+BUSY_MESSAGE = "Classroom AI is handling a lot of questions right now. Please try again in a moment."
+TIMEOUT_MESSAGE = "Gemini took too long to answer. Please try again."
+API_ERROR_PREFIX = "API Error: "
+UNEXPECTED_ERROR_PREFIX = "An error occurred: "
+
+
+def is_error_reply(reply):
     """
-    Works with:
-    gemini_chat(prompt)
-    gemini_chat(prompt, lecture_context)
+    Check whether a gemini_chat() reply is an error message rather than an answer.
+
+    Args:
+        reply (str): Text returned by gemini_chat()
+
+    Returns:
+        bool: True for error and fallback messages
     """
+    return (
+        reply in (EMPTY_RESPONSE_MESSAGE, FILTERED_RESPONSE_MESSAGE, UNAVAILABLE_MESSAGE, BUSY_MESSAGE, TIMEOUT_MESSAGE)
+        or reply.startswith(API_ERROR_PREFIX)
+        or reply.startswith(UNEXPECTED_ERROR_PREFIX)
+    )
+
 
+def build_prompt(question, lecture_context=None):
+    """
+    Build the prompt sent to Gemini.
+
+    Args:
+        question (str): The question, or a complete prompt built by app.py
+        lecture_context (str): Optional lecture content to answer from
+
+    Returns:
+        str: The prompt
+    """
     # If lecture context is provided and meaningful, build strict prompt
     if lecture_context and len(lecture_context.strip()) > 150:
-       prompt = f"""
+        # Keep the prompt within the lecture token budget however large the context is
+        lecture_context = fit_to_budget(question, lecture_context, DEFAULT_BUDGETS["lectures"])
+        return f"""
 You are Classroom AI.
 
 STRICT RULES:
@@ -32,29 +123,299 @@ Answer format:
 • Point 3
 """
 
-    else:
-        # Either external knowledge OR app.py already built the prompt
-        prompt = question
+    # Either external knowledge OR app.py already built the prompt
+    return question
 
-    # Call Gemini with error handling
-    try:
-        response = client.generate_content(prompt)
-        
-        # Check if response has valid content
-        if response.parts and len(response.parts) > 0:
-            return response.text.strip()
-        else:
-            # Handle empty or blocked response
-            return "I couldn't generate a response. This might be due to content filtering or API limitations. Please try again with a different question."
-    
-    except ValueError as e:
+
+def _select_tier(prompt, question, lecture_context, tier):
+    if tier is not None:
+        return tier
+    # With lecture_context the prompt wraps the question; otherwise the prompt is the question
+    if lecture_context:
+        return route(prompt, question, lecture_context).tier
+    return route(prompt).tier
+
+
+def _cache_key(prompt, tier):
+    settings = MODEL_TIERS[tier]
+    return make_key(settings["model"], prompt, settings["generation_config"])
+
+
+def _error_reply(error):
+    if isinstance(error, CircuitOpenError):
+        return UNAVAILABLE_MESSAGE
+    if isinstance(error, RateLimitError):
+        return BUSY_MESSAGE
+    if isinstance(error, DeadlineExceededError):
+        return TIMEOUT_MESSAGE
+    # Transient upstream errors that were still failing when the retries ran out
+    if is_rate_limited(error):
+        return BUSY_MESSAGE
+    if is_timeout(error):
+        return TIMEOUT_MESSAGE
+    if is_retryable(error):
+        return UNAVAILABLE_MESSAGE
+    if isinstance(error, ValueError):
         # Handle API errors (blocked content, rate limits, etc.)
-        error_msg = str(e)
+        error_msg = str(error)
         if "finish_reason" in error_msg or "response" in error_msg.lower():
-            return "The API returned an empty response. This could mean:\n• Your question was filtered by safety systems\n• API rate limit exceeded\n• Please try rephrasing your question or try again later."
-        else:
-            return f"API Error: {error_msg}"
-    
+            return FILTERED_RESPONSE_MESSAGE
+        return f"{API_ERROR_PREFIX}{error_msg}"
+    # Catch other unexpected errors
+    return f"{UNEXPECTED_ERROR_PREFIX}{str(error)}"
+
+
+def gemini_chat(question, lecture_context=None, use_cache=True, timeout=None, hedge=None, tier=None):
+    """
+    Works with:
+    gemini_chat(prompt)
+    gemini_chat(prompt, lecture_context)
+    gemini_chat(prompt, use_cache=False)   # always call the API, never cache
+    gemini_chat(prompt, timeout=20)        # give up after 20 seconds
+    gemini_chat(prompt, hedge=False)       # never send a backup request
+    gemini_chat(prompt, tier="heavy")      # skip routing and use this model tier
+
+    Successful answers are cached by model, prompt and generation config,
+    and concurrent calls with the same prompt share a single API request.
+    timeout defaults to REQUEST_DEADLINE and hedge to HEDGING_ENABLED; the
+    model tier is chosen by model_router.route() unless given.
+    """
+    prompt = build_prompt(question, lecture_context)
+    tier = _select_tier(prompt, question, lecture_context, tier)
+
+    cache_key = _cache_key(prompt, tier)
+    if not use_cache:
+        return _call_gemini(prompt, tier, cache_key, use_cache, timeout, hedge)
+
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    # Waiters get the first caller's answer, made under the first caller's timeout
+    return single_flight.do(cache_key, lambda: _call_gemini(prompt, tier, cache_key, use_cache, timeout, hedge))
+
+
+def _expiry(timeout):
+    # Absolute deadline shared by the caller and every attempt made for it
+    return None if timeout is None else time.monotonic() + timeout
+
+
+def _call_gemini(prompt, tier, cache_key, use_cache, timeout, hedge):
+    # Call Gemini with error handling
+    deadline = REQUEST_DEADLINE if timeout is None else timeout
+    expires = _expiry(deadline)
+    try:
+        response = hedger.call(
+            lambda: _generate(prompt, tier, expires),
+            deadline=deadline,
+            hedge=HEDGING_ENABLED if hedge is None else hedge,
+        )
+        return _answer_from_response(response, cache_key, use_cache)
     except Exception as e:
-        # Catch other unexpected errors
-        return f"An error occurred: {str(e)}"
+        return _error_reply(e)
+
+
+def _generate(prompt, tier, expires=None, stream=False):
+    # Rate limiting, retries with backoff and the circuit breaker around one upstream call.
+    # Attempts stop at expires (time.monotonic()), when the caller stops waiting for them.
+    def request():
+        model = get_client(tier)
+        if stream:
+            # An SDK timeout would cover the whole stream, not just its opening
+            return model.generate_content(prompt, stream=True)
+        if expires is None:
+            return model.generate_content(prompt)
+        # The upstream call ends with the deadline, so a hung request does not hold a hedge worker
+        return model.generate_content(prompt, request_options={"timeout": max(0.0, expires - time.monotonic())})
+
+    return call_with_resilience(
+        request,
+        limiter=rate_limiter,
+        breaker=circuit_breaker,
+        tokens=count_tokens(prompt),
+        max_retries=MAX_RETRIES,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        deadline=expires,
+    )
+
+
+def _answer_from_response(response, cache_key, use_cache):
+    # Check if response has valid content
+    if response.parts and len(response.parts) > 0:
+        answer = response.text.strip()
+        # Only real answers are cached; error messages are not
+        if use_cache:
+            response_cache.put(cache_key, answer)
+        return answer
+    # Handle empty or blocked response
+    return EMPTY_RESPONSE_MESSAGE
+
+
+def _request_semaphore():
+    loop = asyncio.get_running_loop()
+    semaphore = _loop_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        _loop_semaphores[loop] = semaphore
+    return semaphore
+
+
+async def gemini_chat_async(question, lecture_context=None, use_cache=True, tier=None):
+    """
+    Async variant of gemini_chat().
+
+    At most MAX_CONCURRENT_REQUESTS calls are in flight per event loop;
+    further calls wait for a slot instead of hitting the API at once.
+
+    Args:
+        question (str): The question, or a complete prompt
+        lecture_context (str): Optional lecture content to answer from
+        use_cache (bool): Serve and store answers through the response cache
+        tier (str): Model tier to use, or None to route automatically
+
+    Returns:
+        str: The answer, or an error message
+    """
+    prompt = build_prompt(question, lecture_context)
+    tier = _select_tier(prompt, question, lecture_context, tier)
+
+    cache_key = _cache_key(prompt, tier)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    try:
+        async with _request_semaphore():
+            response = await call_with_resilience_async(
+                lambda: get_client(tier).generate_content_async(prompt),
+                limiter=rate_limiter,
+                breaker=circuit_breaker,
+                tokens=count_tokens(prompt),
+                max_retries=MAX_RETRIES,
+                base_delay=RETRY_BASE_DELAY,
+                max_delay=RETRY_MAX_DELAY,
+            )
+        return _answer_from_response(response, cache_key, use_cache)
+    except Exception as e:
+        return _error_reply(e)
+
+
+async def gemini_chat_many(questions, lecture_context=None, use_cache=True, max_concurrency=None):
+    """
+    Answer several prompts concurrently, overlapping their network waits.
+
+    Args:
+        questions (list): Questions or complete prompts
+        lecture_context (str): Optional lecture content shared by all questions
+        use_cache (bool): Serve and store answers through the response cache
+        max_concurrency (int): Tighter limit for this batch (MAX_CONCURRENT_REQUESTS still applies)
+
+    Returns:
+        list: Answers in the same order as the questions
+    """
+    batch_limit = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    async def answer(question):
+        if batch_limit is None:
+            return await gemini_chat_async(question, lecture_context, use_cache)
+        async with batch_limit:
+            return await gemini_chat_async(question, lecture_context, use_cache)
+
+    return await asyncio.gather(*(answer(question) for question in questions))
+
+
+def gemini_chat_batch(questions, lecture_context=None, use_cache=True, max_concurrency=None):
+    """
+    Blocking wrapper around gemini_chat_many() for scripts and batch jobs,
+    e.g. generating notes for every lecture in a unit.
+
+    Returns:
+        list: Answers in the same order as the questions
+    """
+    return asyncio.run(gemini_chat_many(questions, lecture_context, use_cache, max_concurrency))
+
+
+class GeminiStream:
+    """
+    Iterable of text deltas from a streaming Gemini call.
+
+    After iteration, text holds the full reply and failed tells whether an
+    error message was emitted, so callers can decide whether to keep it.
+
+    Opening the stream and receiving its first chunk must finish within
+    timeout (STREAM_FIRST_CHUNK_DEADLINE by default), and a slow open is
+    hedged like gemini_chat() calls.
+    """
+
+    def __init__(self, prompt, use_cache=True, tier=None, timeout=None, hedge=None):
+        self.prompt = prompt
+        self.use_cache = use_cache
+        self.tier = tier if tier is not None else route(prompt).tier
+        self.timeout = STREAM_FIRST_CHUNK_DEADLINE if timeout is None else timeout
+        self.hedge = HEDGING_ENABLED if hedge is None else hedge
+        self.text = ""
+        self.failed = False
+
+    def __iter__(self):
+        cache_key = _cache_key(self.prompt, self.tier)
+        if self.use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                self.text = cached
+                yield cached
+                return
+
+        parts = []
+        try:
+            # Only opening the stream is retried and hedged; a stream that fails midway is reported as is
+            expires = _expiry(self.timeout)
+            first, rest = stream_hedger.call(lambda: self._open(expires), deadline=self.timeout, hedge=self.hedge)
+            for chunk in itertools.chain(first, rest):
+                if chunk.parts:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        except Exception as e:
+            self.failed = True
+            message = _error_reply(e)
+            # Keep whatever already arrived and append the error below it
+            if parts:
+                message = f"\n\n{message}"
+            parts.append(message)
+            yield message
+
+        answer = "".join(parts).strip()
+        if not answer:
+            self.failed = True
+            answer = EMPTY_RESPONSE_MESSAGE
+            yield answer
+
+        self.text = answer
+        if self.use_cache and not self.failed:
+            response_cache.put(cache_key, answer)
+
+
+    def _open(self, expires):
+        # Open the stream and wait for its first chunk, so the deadline covers time to first text
+        response = _generate(self.prompt, self.tier, expires, stream=True)
+        chunks = iter(response)
+        return list(itertools.islice(chunks, 1)), chunks
+
+
+def gemini_chat_stream(question, lecture_context=None, use_cache=True, tier=None, timeout=None, hedge=None):
+    """
+    Streaming variant of gemini_chat() for incremental rendering.
+
+    Args:
+        question (str): The question, or a complete prompt built by app.py
+        lecture_context (str): Optional lecture content to answer from
+        use_cache (bool): Serve and store answers through the response cache
+        tier (str): Model tier to use, or None to route automatically
+        timeout (float): Seconds allowed until the first chunk (STREAM_FIRST_CHUNK_DEADLINE if None)
+        hedge (bool): Allow a backup stream when the first is slow to open (HEDGING_ENABLED if None)
+
+    Returns:
+        GeminiStream: Iterable of text deltas, e.g. for st.write_stream()
+    """
+    prompt = build_prompt(question, lecture_context)
+    return GeminiStream(prompt, use_cache, _select_tier(prompt, question, lecture_context, tier), timeout, hedge)
@@ -1,14 +1,151 @@
 import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import threading
 
-# Load gemini.env file
-load_dotenv(".env")
+# Model backend: "live" calls the Gemini API, "fake" uses the offline fake_gemini model
+BACKEND = os.getenv("GEMINI_BACKEND", "live")
 
-API_KEY = os.getenv("GEMI_API_KEY") or os.getenv("GEMINI_API_KEY")
-print("API Key loaded:", "***" if API_KEY else None)
-if not API_KEY:
-    raise ValueError("GEMI_API_KEY or GEMINI_API_KEY not found. Check gemini.env or .env file")
+MODEL_NAME = "gemini-3-flash-preview"
+GENERATION_CONFIG = {}
 
-genai.configure(api_key=API_KEY)
-client = genai.GenerativeModel('gemini-3-flash-preview')
+# Model tiers: simple questions go to the light model, long or complex requests to the heavy one
+MODEL_TIERS = {
+    "light": {"model": "gemini-2.5-flash-lite", "generation_config": {}},
+    "heavy": {"model": MODEL_NAME, "generation_config": GENERATION_CONFIG},
+}
+DEFAULT_TIER = "heavy"
+ROUTING_ENABLED = True
+
+# Largest request the light tier takes: whole prompt and retrieved context in approximate
+# tokens, and question length in words. Chat context is already capped by the
+# context_packer budgets, so None sizes the token limits from those budgets: chat
+# questions then route on the question itself, and only context beyond the budgets escalates.
+ROUTER_LIGHT_MAX_PROMPT_TOKENS = None
+ROUTER_LIGHT_MAX_CONTEXT_TOKENS = None
+ROUTER_LIGHT_MAX_QUESTION_WORDS = 30
+
+# Response cache: in-memory LRU size, SQLite file (None disables the disk tier) and TTL in seconds
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_DB = os.path.join("response_cache", "responses.sqlite3")
+RESPONSE_CACHE_TTL = 7 * 24 * 3600
+
+# Upper bound on concurrent requests from the async API (per event loop)
+MAX_CONCURRENT_REQUESTS = 8
+
+# Client-side rate limits shared by every session, and the longest a call may queue for them
+RATE_LIMIT_REQUESTS_PER_MINUTE = 60
+RATE_LIMIT_TOKENS_PER_MINUTE = 250000
+RATE_LIMIT_MAX_WAIT = 30.0
+
+# Retries for rate-limit, timeout and server errors (jittered exponential backoff, in seconds)
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 20.0
+
+# Circuit breaker: consecutive failures before failing fast, and seconds before a trial call
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_TIMEOUT = 30.0
+
+# Default per-call deadline in seconds (None waits indefinitely)
+REQUEST_DEADLINE = 60.0
+
+# Default deadline for the first chunk of a streamed answer, in seconds (None waits indefinitely).
+# Later chunks are not timed: a stream that is producing text is visibly progressing.
+STREAM_FIRST_CHUNK_DEADLINE = 20.0
+
+# Hedging: send one backup request when the first is slower than this latency percentile,
+# for at most HEDGE_MAX_FRACTION of requests, once HEDGE_MIN_SAMPLES latencies are known
+HEDGING_ENABLED = True
+HEDGE_PERCENTILE = 95
+HEDGE_MAX_FRACTION = 0.05
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY = 1.0
+
+# Clients are built on first use and shared by the whole process
+_clients = {}
+_client_lock = threading.Lock()
+_api_key = None
+
+
+def load_api_key():
+    """
+    Read the Gemini API key from the environment (or .env), once per process.
+
+    Returns:
+        str: The API key
+
+    Raises:
+        ValueError: If no key is configured
+    """
+    global _api_key
+    if _api_key is None:
+        from dotenv import load_dotenv
+
+        # Load gemini.env file
+        load_dotenv(".env")
+
+        api_key = os.getenv("GEMI_API_KEY") or os.getenv("GEMINI_API_KEY")
+        print("API Key loaded:", "***" if api_key else None)
+        if not api_key:
+            raise ValueError("GEMI_API_KEY or GEMINI_API_KEY not found. Check gemini.env or .env file")
+        _api_key = api_key
+    return _api_key
+
+
+def _live_model(model_name, generation_config):
+    import google.generativeai as genai
+
+    if not _clients:
+        genai.configure(api_key=load_api_key())
+    return genai.GenerativeModel(model_name, generation_config=generation_config)
+
+
+def _fake_model(model_name, generation_config):
+    from fake_gemini import FakeGenerativeModel
+
+    return FakeGenerativeModel.from_env(model_name, generation_config)
+
+
+# Backend name -> factory(model_name, generation_config) returning an object with
+# generate_content(prompt, stream=False, request_options=None) and generate_content_async(prompt)
+BACKENDS = {
+    "live": _live_model,
+    "fake": _fake_model,
+}
+
+
+def get_client(tier=DEFAULT_TIER):
+    """
+    Get the model client for a tier, creating it on first use.
+
+    The backend is chosen by GEMINI_BACKEND. google.generativeai is imported
+    and configured only here, so importing this module stays cheap for pages
+    that never call Gemini.
+
+    Args:
+        tier (str): Key of MODEL_TIERS
+
+    Returns:
+        Model client shared by every caller in the process
+    """
+    client = _clients.get(tier)
+    if client is None:
+        with _client_lock:
+            client = _clients.get(tier)
+            if client is None:
+                if BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown GEMINI_BACKEND {BACKEND!r}; expected one of {sorted(BACKENDS)}")
+                settings = MODEL_TIERS[tier]
+                client = BACKENDS[BACKEND](settings["model"], settings["generation_config"])
+                _clients[tier] = client
+    return client
+
+
+def __getattr__(name):
+    # Keeps `from gemini_config import client` (and API_KEY) working without doing the work at import time
+    if name == "client":
+        return get_client()
+    if name == "clients":
+        return {tier: get_client(tier) for tier in MODEL_TIERS}
+    if name == "API_KEY":
+        return load_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
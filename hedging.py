@@ -0,0 +1,145 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class DeadlineExceededError(Exception):
+    """Raised when no attempt finished within the call's deadline."""
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies."""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._samples)
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """
+        Latency at the given percentile of the window.
+
+        Args:
+            pct (float): Percentile between 0 and 100
+
+        Returns:
+            float: Latency in seconds, or None with no samples
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+
+class HedgeBudget:
+    """Caps hedged requests at a fraction of all requests."""
+
+    def __init__(self, max_fraction):
+        self.max_fraction = max_fraction
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        """
+        Claim one hedge if the budget allows it.
+
+        Returns:
+            bool: True if a hedge may be sent
+        """
+        with self._lock:
+            if self.hedges + 1 > self.max_fraction * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+
+class Hedger:
+    """
+    Runs calls with a deadline and optional hedging.
+
+    If the first attempt has not answered after the tracked latency
+    percentile, one identical backup attempt is started and whichever
+    finishes first wins. Hedging waits until min_samples latencies have been
+    seen, and the budget keeps it under a fixed share of traffic.
+    """
+
+    def __init__(self, percentile=95, max_fraction=0.05, min_samples=20, min_delay=1.0, max_workers=32):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.tracker = LatencyTracker()
+        self.budget = HedgeBudget(max_fraction)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gemini-hedge")
+
+    def hedge_delay(self):
+        """
+        Seconds to wait for the first attempt before hedging.
+
+        Returns:
+            float: Delay, or None while there are too few samples
+        """
+        if len(self.tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    def call(self, fn, deadline=None, hedge=True):
+        """
+        Call fn() under a deadline, hedging slow attempts.
+
+        Args:
+            fn: Zero-argument callable making the request
+            deadline (float): Seconds before giving up, or None for no limit
+            hedge (bool): Allow a backup attempt
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            DeadlineExceededError: If no attempt finished in time
+            Exception: The error of the last attempt if all attempts failed
+        """
+        self.budget.record_request()
+        start = time.monotonic()
+
+        def remaining():
+            if deadline is None:
+                return None
+            return max(0.0, deadline - (time.monotonic() - start))
+
+        pending = {self._executor.submit(fn)}
+        delay = self.hedge_delay() if hedge else None
+        if delay is not None:
+            timeout = delay if deadline is None else min(delay, remaining())
+            done, _ = wait(pending, timeout=timeout)
+            if not done and (deadline is None or remaining() > 0) and self.budget.try_spend():
+                pending.add(self._executor.submit(fn))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, timeout=remaining(), return_when=FIRST_COMPLETED)
+            if not done:
+                # Running attempts cannot be interrupted; they stop at their own deadline checks.
+                # Attempts still queued for a worker are dropped.
+                for future in pending:
+                    future.cancel()
+                raise DeadlineExceededError(f"No response within {deadline:g}s")
+            for future in done:
+                if future.exception() is None:
+                    self.tracker.record(time.monotonic() - start)
+                    return future.result()
+                error = future.exception()
+        raise error
@@ -0,0 +1,533 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from bm25 import BM25Index, count_terms, intern_terms, tokenize
+from connect import iter_lecture_files
+
+# Chunk sizes are measured in words
+CHUNK_SIZE = 200
+CHUNK_OVERLAP = 50
+TOP_K = 5
+
+# Retrieval engine: "bm25" (inverted index) or "tfidf" (dense cosine similarity)
+ENGINE = "bm25"
+
+# Saved shard snapshots, one directory per subject and one file per transcript
+# (kept outside cloud_storage so they never show up as a subject)
+INDEX_DIR = "index_cache"
+SNAPSHOT_VERSION = 3
+
+# Subject shards kept in memory at once; the least recently used is evicted
+MAX_LOADED_SHARDS = 8
+
+# Chunked and tokenized PDF pages, keyed by page content digest, reused when
+# a revised document is attached again
+MAX_CACHED_PAGE_CHUNKS = 4096
+
+# Seconds between full mtime scans; uploads mark files dirty explicitly
+RESCAN_INTERVAL = 60
+
+
+def chunk_text(text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Split text into overlapping word windows.
+
+    Args:
+        text (str): Text to split
+        chunk_size (int): Number of words per chunk
+        overlap (int): Number of words shared by consecutive chunks
+
+    Returns:
+        list: List of chunk strings
+    """
+    words = text.split()
+    if not words:
+        return []
+
+    step = max(chunk_size - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_size]))
+        if start + chunk_size >= len(words):
+            break
+    return chunks
+
+
+def scan_transcripts(base_dir):
+    """
+    Find every lecture transcript (.txt) under the storage directory.
+
+    Args:
+        base_dir (str): Root of the lecture storage
+
+    Returns:
+        dict: Mapping of transcript path to modification time
+    """
+    mtimes = {}
+    for path in iter_lecture_files(base_dir):
+        try:
+            mtimes[path] = os.path.getmtime(path)
+        except OSError:
+            # Removed between listing and stat
+            continue
+    return mtimes
+
+
+def _read_chunks(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return chunk_text(f.read())
+
+
+def _snapshot_name(path):
+    return hashlib.sha1(path.encode("utf-8")).hexdigest() + ".pkl"
+
+
+class LectureShard:
+    """
+    BM25 or TF-IDF index over overlapping chunks of one subject's transcripts.
+
+    Each transcript's chunks (and, for BM25, their term counts) are stored per
+    file together with the file's mtime and saved to their own snapshot file,
+    so a refresh only reads, tokenizes and saves transcripts that were added,
+    changed or deleted. The index over the whole subject is then merged from
+    the per-file counts outside the lock and swapped in, so searches keep
+    using the previous index meanwhile.
+    """
+
+    def __init__(self, base_dir, snapshot_dir, engine=ENGINE):
+        self.base_dir = base_dir
+        self.snapshot_dir = snapshot_dir
+        self.engine = engine
+        self.files = {}
+        self.chunks = []
+        self.sources = []
+        self.bm25 = None
+        self.vectorizer = None
+        self.matrix = None
+        # Grow-only vocabulary of the per-file term counts, so a rebuild only
+        # maps the terms of files that changed
+        self.vocab = {}
+        self.dirty = set()
+        self.last_scan = 0.0
+        self.ready = False
+        self._lock = threading.Lock()
+        # Serializes refreshes; searches only take _lock, briefly
+        self._refresh_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, base_dir, snapshot_dir, engine=ENGINE):
+        """
+        Load the saved per-file snapshots, or start an empty shard if there are none.
+
+        Args:
+            base_dir (str): Subject directory holding the transcripts
+            snapshot_dir (str): Directory of the shard's snapshot files
+            engine (str): "bm25" or "tfidf"
+
+        Returns:
+            LectureShard: The loaded shard
+        """
+        shard = cls(base_dir, snapshot_dir, engine)
+        if os.path.isdir(snapshot_dir):
+            for name in os.listdir(snapshot_dir):
+                if not name.endswith(".pkl"):
+                    continue
+                try:
+                    with open(os.path.join(snapshot_dir, name), "rb") as f:
+                        snapshot = pickle.load(f)
+                except Exception:
+                    # Corrupt or incompatible snapshot: the file is re-read from its transcript
+                    continue
+                if (isinstance(snapshot, dict)
+                        and snapshot.get("version") == SNAPSHOT_VERSION
+                        and snapshot.get("engine") == engine
+                        and snapshot.get("path", "").startswith(os.path.join(base_dir, ""))):
+                    shard.files[snapshot["path"]] = shard._intern(snapshot["entry"])
+        if shard.files:
+            shard._swap(shard.files, shard._fit(shard.files))
+        return shard
+
+    def _save_file(self, path, entry):
+        # One snapshot per transcript, written atomically, so an upload rewrites only its own file
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        entry = {key: value for key, value in entry.items() if key != "term_ids"}
+        snapshot = {"version": SNAPSHOT_VERSION, "engine": self.engine, "path": path, "entry": entry}
+        fd, tmp_file = tempfile.mkstemp(dir=self.snapshot_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_file, os.path.join(self.snapshot_dir, _snapshot_name(path)))
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+
+    def _delete_file(self, path):
+        try:
+            os.remove(os.path.join(self.snapshot_dir, _snapshot_name(path)))
+        except OSError:
+            pass
+
+    def _read_file(self, path):
+        chunks = _read_chunks(path)
+        entry = {"mtime": os.path.getmtime(path), "chunks": chunks}
+        if self.engine == "bm25":
+            entry["postings"] = count_terms([tokenize(chunk) for chunk in chunks])
+        return self._intern(entry)
+
+    def _intern(self, entry):
+        # Only called under _refresh_lock (or before the shard is shared)
+        if self.engine == "bm25":
+            entry["term_ids"] = intern_terms(entry["postings"], self.vocab)
+        return entry
+
+    def mark_dirty(self, path):
+        """
+        Flag a single transcript for re-indexing on the next refresh.
+
+        Args:
+            path (str): Path of the added or changed transcript
+        """
+        with self._lock:
+            self.dirty.add(path)
+
+    def refresh(self, force_scan=False):
+        """
+        Bring the index up to date with the storage directory.
+
+        Dirty files are always re-read. A full mtime scan runs on the first
+        refresh and then at most every RESCAN_INTERVAL seconds. While another
+        thread is refreshing a shard that already has an index, this returns
+        at once and the caller searches the current index.
+
+        Args:
+            force_scan (bool): Scan the whole directory regardless of the interval
+
+        Returns:
+            bool: True if the index changed
+        """
+        if not self._refresh_lock.acquire(blocking=not self.ready or force_scan):
+            return False
+        try:
+            now = time.time()
+            with self._lock:
+                scan = force_scan or not self.last_scan or now - self.last_scan >= RESCAN_INTERVAL
+                dirty, self.dirty = self.dirty, set()
+                if scan:
+                    self.last_scan = now
+            files = dict(self.files)
+            changed = False
+
+            if scan:
+                mtimes = scan_transcripts(self.base_dir)
+                for path in list(files):
+                    if path not in mtimes:
+                        del files[path]
+                        self._delete_file(path)
+                        changed = True
+                for path, mtime in mtimes.items():
+                    entry = files.get(path)
+                    if entry is None or entry["mtime"] != mtime:
+                        dirty.add(path)
+
+            for path in dirty:
+                try:
+                    entry = self._read_file(path)
+                except OSError:
+                    # Deleted (or unreadable) since it was flagged
+                    files.pop(path, None)
+                    self._delete_file(path)
+                else:
+                    files[path] = entry
+                    self._save_file(path, entry)
+                changed = True
+
+            if changed or not self.ready:
+                self._swap(files, self._fit(files))
+            return changed
+        finally:
+            self._refresh_lock.release()
+
+    def _fit(self, files):
+        # IDF weights depend on the whole corpus, so the subject index is rebuilt,
+        # but BM25 only merges the per-file term counts; nothing is re-tokenized.
+        paths = sorted(files)
+        chunks = []
+        sources = []
+        for path in paths:
+            chunks.extend(files[path]["chunks"])
+            sources.extend([path] * len(files[path]["chunks"]))
+
+        bm25 = vectorizer = matrix = None
+        if chunks:
+            if self.engine == "bm25":
+                bm25 = BM25Index.from_postings(
+                    [(files[path]["postings"], files[path]["term_ids"]) for path in paths], self.vocab)
+            else:
+                # Only the TF-IDF engine needs scikit-learn, which is slow to import
+                from sklearn.feature_extraction.text import TfidfVectorizer
+                vectorizer = TfidfVectorizer(stop_words="english", sublinear_tf=True)
+                matrix = vectorizer.fit_transform(chunks)
+        return chunks, sources, bm25, vectorizer, matrix
+
+    def _swap(self, files, fitted):
+        with self._lock:
+            self.files = files
+            self.chunks, self.sources, self.bm25, self.vectorizer, self.matrix = fitted
+            self.ready = True
+
+    def search(self, query, top_k=TOP_K):
+        """
+        Find the chunks most relevant to a query.
+
+        Args:
+            query (str): The question or search text
+            top_k (int): Maximum number of chunks to return
+
+        Returns:
+            list: Dicts with 'source', 'text' and 'score', best first
+        """
+        with self._lock:
+            bm25, vectorizer, matrix = self.bm25, self.vectorizer, self.matrix
+            chunks, sources = self.chunks, self.sources
+
+        if not query.strip():
+            return []
+
+        if bm25 is not None:
+            ranked = bm25.search(query, top_k)
+        elif matrix is not None:
+            from sklearn.metrics.pairwise import linear_kernel
+            query_vector = vectorizer.transform([query])
+            # Rows are L2-normalised, so the dot product is the cosine similarity
+            scores = linear_kernel(query_vector, matrix).ravel()
+            ranked = [(i, float(scores[i])) for i in scores.argsort()[::-1][:top_k] if scores[i] > 0]
+        else:
+            return []
+
+        return [
+            {"source": sources[i], "text": chunks[i], "score": score}
+            for i, score in ranked
+        ]
+
+
+class LectureIndex:
+    """
+    Lecture index sharded by subject directory (cloud_storage/<subject>/).
+
+    Shards are loaded lazily on first query and evicted independently, so a
+    query only touches the subjects it is restricted to.
+    """
+
+    def __init__(self, base_dir, index_dir=INDEX_DIR, engine=ENGINE, max_loaded=MAX_LOADED_SHARDS):
+        self.base_dir = base_dir
+        self.index_dir = index_dir
+        self.engine = engine
+        self.max_loaded = max_loaded
+        self._shards = OrderedDict()
+        self._lock = threading.Lock()
+
+    def subjects(self):
+        """
+        List the subject directories under the storage root.
+
+        Returns:
+            list: Subject names, sorted
+        """
+        if not os.path.exists(self.base_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.base_dir)
+            if os.path.isdir(os.path.join(self.base_dir, name))
+        )
+
+    def shard(self, subject):
+        """
+        Get a subject's shard, loading it from its snapshot if needed.
+
+        Args:
+            subject (str): Subject directory name
+
+        Returns:
+            LectureShard: The subject's shard
+        """
+        with self._lock:
+            shard = self._shards.get(subject)
+            if shard is not None:
+                self._shards.move_to_end(subject)
+                return shard
+
+            shard = LectureShard.load(
+                os.path.join(self.base_dir, subject),
+                os.path.join(self.index_dir, subject),
+                self.engine,
+            )
+            self._shards[subject] = shard
+            while len(self._shards) > self.max_loaded:
+                # Evicted shards are already saved; they reload from disk on demand
+                self._shards.popitem(last=False)
+            return shard
+
+    def mark_dirty(self, path):
+        """
+        Flag a single transcript for re-indexing in its subject's shard.
+
+        Args:
+            path (str): Path of the added or changed transcript
+        """
+        subject = os.path.relpath(path, self.base_dir).split(os.sep)[0]
+        with self._lock:
+            shard = self._shards.get(subject)
+        # An unloaded shard rescans its directory when it is next loaded
+        if shard is not None:
+            shard.mark_dirty(path)
+
+    def search(self, query, subjects=None, top_k=TOP_K):
+        """
+        Find the chunks most relevant to a query across subject shards.
+
+        Args:
+            query (str): The question or search text
+            subjects (list): Subjects to search (all subjects if None)
+            top_k (int): Maximum number of chunks to return
+
+        Returns:
+            list: Dicts with 'source', 'text' and 'score', best first
+        """
+        available = self.subjects()
+        if subjects is not None:
+            allowed = set(subjects)
+            available = [subject for subject in available if subject in allowed]
+
+        results = []
+        for subject in available:
+            shard = self.shard(subject)
+            shard.refresh()
+            results.extend(shard.search(query, top_k))
+
+        # Scores come from per-shard statistics, which is close enough to rank the merged list
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results[:top_k]
+
+
+_page_chunks = OrderedDict()
+_page_chunks_lock = threading.Lock()
+
+
+def _chunk_page(block):
+    if block.digest is None:
+        return [(chunk, tokenize(chunk)) for chunk in chunk_text(block.text)]
+
+    with _page_chunks_lock:
+        entries = _page_chunks.get(block.digest)
+        if entries is not None:
+            _page_chunks.move_to_end(block.digest)
+            return entries
+
+    entries = [(chunk, tokenize(chunk)) for chunk in chunk_text(block.text)]
+    with _page_chunks_lock:
+        _page_chunks[block.digest] = entries
+        while len(_page_chunks) > MAX_CACHED_PAGE_CHUNKS:
+            _page_chunks.popitem(last=False)
+    return entries
+
+
+class DocumentIndex:
+    """
+    BM25 index over the chunks of one uploaded document.
+
+    Built once when the document is attached, so each chat question only
+    pulls the relevant pages or sections into the prompt.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.chunks = []
+        self.labels = []
+        self.bm25 = BM25Index()
+
+    @classmethod
+    def build(cls, name, blocks):
+        """
+        Chunk and index a document as it is being extracted.
+
+        Pages are chunked individually, and pages whose content digest was
+        seen before reuse their existing chunks. Consecutive Word paragraphs
+        are grouped into chunks of about CHUNK_SIZE words.
+
+        Args:
+            name (str): Document file name
+            blocks: Iterable of records with 'page', 'paragraph' and 'text'
+                    (e.g. document_extractor.iter_document_blocks)
+
+        Returns:
+            DocumentIndex: The finished index
+        """
+        index = cls(name)
+        pending = []
+        pending_words = 0
+
+        for block in blocks:
+            if block.page is not None:
+                for chunk, tokens in _chunk_page(block):
+                    index._add(f"{name}, page {block.page}", chunk, tokens)
+                continue
+
+            pending.append(block)
+            pending_words += len(block.text.split())
+            if pending_words >= CHUNK_SIZE:
+                index._add_paragraphs(pending)
+                pending = []
+                pending_words = 0
+
+        if pending:
+            index._add_paragraphs(pending)
+        index.bm25.finalize()
+        return index
+
+    def _add(self, label, chunk, tokens=None):
+        self.chunks.append(chunk)
+        self.labels.append(label)
+        self.bm25.add_tokens(tokens if tokens is not None else tokenize(chunk))
+
+    def _add_paragraphs(self, paragraphs):
+        first, last = paragraphs[0].paragraph + 1, paragraphs[-1].paragraph + 1
+        label = f"{self.name}, paragraph {first}" if first == last else f"{self.name}, paragraphs {first}-{last}"
+        self._add(label, "\n".join(p.text for p in paragraphs))
+
+    def search(self, query, top_k=TOP_K):
+        """
+        Find the document chunks most relevant to a query.
+
+        Questions about the document as a whole ("Summarize this document")
+        match no terms; they get chunks sampled evenly through the document
+        instead, scored in document order so a token budget keeps the
+        earliest ones.
+
+        Args:
+            query (str): The question
+            top_k (int): Maximum number of chunks to return
+
+        Returns:
+            list: Dicts with 'label', 'text' and 'score', best first
+        """
+        hits = self.bm25.search(query, top_k)
+        if not hits and self.chunks and top_k > 0:
+            hits = self._overview(top_k)
+        return [
+            {"label": self.labels[i], "text": self.chunks[i], "score": score}
+            for i, score in hits
+        ]
+
+    def _overview(self, top_k):
+        count = len(self.chunks)
+        if count <= top_k:
+            indices = list(range(count))
+        else:
+            step = (count - 1) / max(top_k - 1, 1)
+            indices = sorted({round(i * step) for i in range(top_k)})
+        # Small scores that fall in document order
+        return [(i, 1e-3 * (len(indices) - rank)) for rank, i in enumerate(indices)]
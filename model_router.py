@@ -0,0 +1,87 @@
+import logging
+import re
+from collections import namedtuple
+from gemini_config import (
+    MODEL_TIERS,
+    DEFAULT_TIER,
+    ROUTING_ENABLED,
+    ROUTER_LIGHT_MAX_PROMPT_TOKENS,
+    ROUTER_LIGHT_MAX_CONTEXT_TOKENS,
+    ROUTER_LIGHT_MAX_QUESTION_WORDS,
+)
+from context_packer import DEFAULT_BUDGETS, count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Token limits left as None in gemini_config follow the packer budgets: a full
+# packed context plus its chunk labels and section headings, and on top of that
+# the instructions, conversation history and question wrapped around it
+CONTEXT_FORMATTING_HEADROOM = 1.2
+PROMPT_OVERHEAD_TOKENS = 1500
+
+LIGHT_MAX_CONTEXT_TOKENS = (
+    ROUTER_LIGHT_MAX_CONTEXT_TOKENS if ROUTER_LIGHT_MAX_CONTEXT_TOKENS is not None
+    else int(sum(DEFAULT_BUDGETS.values()) * CONTEXT_FORMATTING_HEADROOM)
+)
+LIGHT_MAX_PROMPT_TOKENS = (
+    ROUTER_LIGHT_MAX_PROMPT_TOKENS if ROUTER_LIGHT_MAX_PROMPT_TOKENS is not None
+    else LIGHT_MAX_CONTEXT_TOKENS + PROMPT_OVERHEAD_TOKENS
+)
+
+# Requests for reasoning, synthesis or long-form output rather than a fact lookup
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|explain|compare|contrast|differen\w*|derive|derivation|prove|proof|analy[sz]e\w*|"
+    r"evaluate|justify|step[- ]by[- ]step|summar\w*|notes|essay|design|implement|solve)\b",
+    re.IGNORECASE,
+)
+
+RoutingDecision = namedtuple("RoutingDecision", ["tier", "model", "reason"])
+
+
+def _decide(prompt, question, context):
+    if not ROUTING_ENABLED:
+        return DEFAULT_TIER, "routing disabled"
+
+    prompt_tokens = count_tokens(prompt)
+    if prompt_tokens > LIGHT_MAX_PROMPT_TOKENS:
+        return "heavy", f"prompt has {prompt_tokens} tokens"
+
+    context_tokens = count_tokens(context) if context else 0
+    if context_tokens > LIGHT_MAX_CONTEXT_TOKENS:
+        return "heavy", f"context has {context_tokens} tokens"
+
+    question = question or prompt
+    words = len(question.split())
+    if words > ROUTER_LIGHT_MAX_QUESTION_WORDS:
+        return "heavy", f"question has {words} words"
+
+    match = COMPLEX_PATTERN.search(question)
+    if match:
+        return "heavy", f"question asks to '{match.group(0).lower()}'"
+    if question.count("?") > 1:
+        return "heavy", "question has several parts"
+
+    return "light", f"short question ({words} words, {prompt_tokens} prompt tokens)"
+
+
+def route(prompt, question=None, context=None):
+    """
+    Pick the model tier for one request.
+
+    Questions asking for reasoning or synthesis, and prompts or retrieved
+    contexts larger than the packer budgets allow, go to the heavy tier;
+    short factual questions go to the light tier, however much packed
+    context they bring. Every decision is logged.
+
+    Args:
+        prompt (str): Full prompt that will be sent
+        question (str): The user's question, if the prompt wraps one
+        context (str): Retrieved context included in the prompt, if any
+
+    Returns:
+        RoutingDecision: tier, model name and the reason for the choice
+    """
+    tier, reason = _decide(prompt, question, context)
+    model = MODEL_TIERS[tier]["model"]
+    logger.info("Routed request to %s tier (%s): %s", tier, model, reason)
+    return RoutingDecision(tier, model, reason)
@@ -1,3 +1,4 @@
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
@@ -7,105 +8,201 @@ from docx import Document
 from docx.shared import Pt, RGBColor, Inches
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from datetime import datetime
+from xml.sax.saxutils import escape
 import io
+from notes_ir import parse_notes
 
-def generate_notes_pdf(lecture_title, lecture_subject, lecture_notes, lecture_date=None):
-    """
-    Generate a PDF document with lecture notes.
-    
-    Args:
-        lecture_title (str): Title of the lecture
-        lecture_subject (str): Subject/topic name
-        lecture_notes (str): The notes content
-        lecture_date (str): Date of the lecture (optional)
-    
-    Returns:
-        bytes: PDF file content as bytes
-    """
-    # Create PDF buffer
-    pdf_buffer = io.BytesIO()
-    
-    # Create PDF document
-    doc = SimpleDocTemplate(
-        pdf_buffer,
-        pagesize=letter,
-        rightMargin=0.75*inch,
-        leftMargin=0.75*inch,
-        topMargin=0.75*inch,
-        bottomMargin=0.75*inch,
-        title=f"{lecture_subject} - {lecture_title}"
-    )
-    
-    # Get styles
-    styles = getSampleStyleSheet()
-    
-    # Create custom styles
-    title_style = ParagraphStyle(
+# reportlab markup for each inline span style of the notes IR
+PDF_SPAN_TAGS = {
+    "bold": ("<b>", "</b>"),
+    "italic": ("<i>", "</i>"),
+    "code": ('<font face="Courier">', "</font>"),
+}
+
+# PDF styles, built once at import instead of on every export
+_sample_styles = getSampleStyleSheet()
+
+ACCENT_COLOR = colors.HexColor("#ff4d4f")
+
+PDF_STYLES = {
+    "title": ParagraphStyle(
         'CustomTitle',
-        parent=styles['Heading1'],
+        parent=_sample_styles['Heading1'],
         fontSize=24,
-        textColor=(255, 77, 79),  # Red color
+        textColor=ACCENT_COLOR,
         spaceAfter=6,
         alignment=TA_CENTER,
         fontName='Helvetica-Bold'
-    )
-    
-    subject_style = ParagraphStyle(
+    ),
+    "subject": ParagraphStyle(
         'CustomSubject',
-        parent=styles['Heading2'],
+        parent=_sample_styles['Heading2'],
         fontSize=14,
-        textColor=(100, 100, 100),
+        textColor=colors.HexColor("#646464"),
         spaceAfter=12,
         alignment=TA_CENTER,
         fontName='Helvetica'
-    )
-    
-    body_style = ParagraphStyle(
+    ),
+    "body": ParagraphStyle(
         'CustomBody',
-        parent=styles['BodyText'],
+        parent=_sample_styles['BodyText'],
         fontSize=11,
         leading=16,
         spaceAfter=10,
         alignment=TA_LEFT
+    ),
+    "footer": ParagraphStyle(
+        'Footer',
+        parent=_sample_styles['Normal'],
+        fontSize=9,
+        textColor=colors.HexColor("#969696"),
+        alignment=TA_CENTER
+    ),
+}
+
+PDF_STYLES["formula"] = ParagraphStyle(
+    'NotesFormula',
+    parent=PDF_STYLES["body"],
+    fontName='Courier',
+    alignment=TA_CENTER
+)
+
+# Headings stay on the same page as the block that follows them
+PDF_HEADING_STYLES = {
+    1: ParagraphStyle('NotesHeading1', parent=_sample_styles['Heading2'], textColor=ACCENT_COLOR,
+                      spaceBefore=10, spaceAfter=6, keepWithNext=1),
+    2: ParagraphStyle('NotesHeading2', parent=_sample_styles['Heading3'], spaceBefore=8, spaceAfter=4, keepWithNext=1),
+    3: ParagraphStyle('NotesHeading3', parent=_sample_styles['Heading4'], spaceBefore=6, spaceAfter=4, keepWithNext=1),
+}
+
+PDF_BULLET_STYLES = {
+    level: ParagraphStyle(
+        f'NotesBullet{level}',
+        parent=PDF_STYLES["body"],
+        leftIndent=18 * level,
+        bulletIndent=18 * level - 12,
+        spaceAfter=4
     )
+    for level in (1, 2, 3)
+}
+
+# python-docx paragraph style for each bullet nesting level
+WORD_BULLET_STYLES = {1: "List Bullet", 2: "List Bullet 2", 3: "List Bullet 3"}
+
+
+def _pdf_markup(spans):
+    # reportlab paragraphs take XML markup, so notes text must be escaped
+    parts = []
+    for text, style in spans:
+        opening, closing = PDF_SPAN_TAGS.get(style, ("", ""))
+        parts.append(f"{opening}{escape(text)}{closing}")
+    return "".join(parts)
+
+
+def render_all_formats(lecture_title, lecture_subject, lecture_notes, lecture_date=None):
+    """
+    Render lecture notes to PDF and Word in one pass.
+
+    The notes are parsed once and both documents share that parse and the
+    generation timestamp.
+
+    Args:
+        lecture_title (str): Title of the lecture
+        lecture_subject (str): Subject/topic name
+        lecture_notes (str): The notes content
+        lecture_date (str): Date of the lecture (optional)
+
+    Returns:
+        dict: 'pdf' and 'docx' file contents as bytes
+    """
+    blocks = parse_notes(lecture_notes)
+    generated_at = datetime.now()
+    return {
+        "pdf": _render_pdf(blocks, lecture_title, lecture_subject, lecture_date, generated_at),
+        "docx": _render_word(blocks, lecture_title, lecture_subject, lecture_date, generated_at),
+    }
+
+
+def generate_notes_pdf(lecture_title, lecture_subject, lecture_notes, lecture_date=None):
+    """
+    Generate a PDF document with lecture notes.
     
-    # Build document content
-    content = []
+    Args:
+        lecture_title (str): Title of the lecture
+        lecture_subject (str): Subject/topic name
+        lecture_notes (str): The notes content
+        lecture_date (str): Date of the lecture (optional)
     
+    Returns:
+        bytes: PDF file content as bytes
+    """
+    return _render_pdf(parse_notes(lecture_notes), lecture_title, lecture_subject, lecture_date, datetime.now())
+
+
+def write_notes_pdf(output, lecture_title, lecture_subject, lecture_notes, lecture_date=None):
+    """
+    Write a lecture notes PDF into a binary file-like object.
+
+    reportlab writes the document straight into output, so callers can
+    target a file or response stream without an intermediate copy.
+
+    Args:
+        output: Binary file-like object to write to
+        lecture_title (str): Title of the lecture
+        lecture_subject (str): Subject/topic name
+        lecture_notes (str): The notes content
+        lecture_date (str): Date of the lecture (optional)
+    """
+    _write_pdf(output, parse_notes(lecture_notes), lecture_title, lecture_subject, lecture_date, datetime.now())
+
+
+def _render_pdf(blocks, lecture_title, lecture_subject, lecture_date, generated_at):
+    pdf_buffer = io.BytesIO()
+    _write_pdf(pdf_buffer, blocks, lecture_title, lecture_subject, lecture_date, generated_at)
+    return pdf_buffer.getvalue()
+
+
+def _pdf_flowables(blocks, lecture_title, lecture_subject, lecture_date, generated_at):
     # Title
-    content.append(Paragraph(f"📚 {lecture_title}", title_style))
-    content.append(Spacer(1, 0.2*inch))
+    yield Paragraph(f"📚 {escape(lecture_title)}", PDF_STYLES["title"])
+    yield Spacer(1, 0.2*inch)
     
     # Subject and date
-    subject_text = f"{lecture_subject}"
+    subject_text = escape(lecture_subject)
     if lecture_date:
-        subject_text += f" | {lecture_date}"
-    content.append(Paragraph(subject_text, subject_style))
-    content.append(Spacer(1, 0.3*inch))
+        subject_text += f" | {escape(lecture_date)}"
+    yield Paragraph(subject_text, PDF_STYLES["subject"])
+    yield Spacer(1, 0.3*inch)
     
-    # Notes content
-    # Clean up notes for PDF display
-    notes_text = lecture_notes.replace('\n', '<br/>').replace('•', '•')
-    content.append(Paragraph(notes_text, body_style))
+    # Notes content, one flowable per block so long notes split cleanly across pages
+    for block in blocks:
+        markup = _pdf_markup(block.spans)
+        if block.kind == "heading":
+            yield Paragraph(markup, PDF_HEADING_STYLES[min(block.level, 3)])
+        elif block.kind == "bullet":
+            yield Paragraph(markup, PDF_BULLET_STYLES[block.level], bulletText='•')
+        elif block.kind == "formula":
+            yield Paragraph(markup, PDF_STYLES["formula"])
+        else:
+            yield Paragraph(markup, PDF_STYLES["body"])
     
     # Footer
-    content.append(Spacer(1, 0.5*inch))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=9,
-        textColor=(150, 150, 150),
-        alignment=TA_CENTER
+    yield Spacer(1, 0.5*inch)
+    generated_text = f"Generated by Classmate AI on {generated_at.strftime('%Y-%m-%d %H:%M:%S')}"
+    yield Paragraph(generated_text, PDF_STYLES["footer"])
+
+
+def _write_pdf(output, blocks, lecture_title, lecture_subject, lecture_date, generated_at):
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=0.75*inch,
+        leftMargin=0.75*inch,
+        topMargin=0.75*inch,
+        bottomMargin=0.75*inch,
+        title=f"{lecture_subject} - {lecture_title}"
     )
-    generated_text = f"Generated by Classmate AI on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    content.append(Paragraph(generated_text, footer_style))
-    
-    # Build PDF
-    doc.build(content)
-    
-    # Get PDF bytes
-    pdf_buffer.seek(0)
-    return pdf_buffer.getvalue()
+    doc.build(list(_pdf_flowables(blocks, lecture_title, lecture_subject, lecture_date, generated_at)))
 
 
 def generate_notes_word(lecture_title, lecture_subject, lecture_notes, lecture_date=None):
@@ -121,9 +218,18 @@ def generate_notes_word(lecture_title, lecture_subject, lecture_notes, lecture_d
     Returns:
         bytes: Word document file content as bytes
     """
+    return _render_word(parse_notes(lecture_notes), lecture_title, lecture_subject, lecture_date, datetime.now())
+
+
+def _render_word(blocks, lecture_title, lecture_subject, lecture_date, generated_at):
     # Create Word document
     doc = Document()
     
+    # Notes text inherits its font from the Normal style instead of per-run formatting
+    normal_font = doc.styles['Normal'].font
+    normal_font.name = 'Calibri'
+    normal_font.size = Pt(11)
+    
     # Add title
     title = doc.add_heading(f"📚 {lecture_title}", level=1)
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -143,26 +249,34 @@ def generate_notes_word(lecture_title, lecture_subject, lecture_notes, lecture_d
     # Add spacing
     doc.add_paragraph()
     
-    # Add notes content
-    # Split notes by lines and add as paragraphs
-    for line in lecture_notes.split('\n'):
-        if line.strip():
-            # Check if it's a bullet point
-            if line.strip().startswith('•') or line.strip().startswith('-'):
-                p = doc.add_paragraph(line.strip(), style='List Bullet')
-            else:
-                p = doc.add_paragraph(line.strip())
-            
-            # Format text
+    # Add notes content, one paragraph per block
+    for block in blocks:
+        if block.kind == "heading":
+            p = doc.add_heading(level=min(block.level + 1, 4))
+        elif block.kind == "bullet":
+            p = doc.add_paragraph(style=WORD_BULLET_STYLES[block.level])
+        else:
+            p = doc.add_paragraph()
+        
+        for text, style in block.spans:
+            run = p.add_run(text)
+            if style == "bold":
+                run.bold = True
+            elif style == "italic":
+                run.italic = True
+            elif style == "code":
+                run.font.name = 'Consolas'
+        
+        if block.kind == "formula":
+            p.alignment = WD_ALIGN_PARAGRAPH.CENTER
             for run in p.runs:
-                run.font.size = Pt(11)
-                run.font.name = 'Calibri'
+                run.font.name = 'Cambria Math'
     
     # Add footer
     doc.add_paragraph()
     footer_para = doc.add_paragraph()
     footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    footer_run = footer_para.add_run(f"Generated by Classmate AI on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    footer_run = footer_para.add_run(f"Generated by Classmate AI on {generated_at.strftime('%Y-%m-%d %H:%M:%S')}")
     footer_run.font.size = Pt(9)
     footer_run.font.color.rgb = RGBColor(150, 150, 150)
     
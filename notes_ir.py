@@ -0,0 +1,155 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Distinct notes strings whose parsed form is kept
+MAX_CACHED_NOTES = 64
+
+# One block of notes. kind is "heading", "bullet", "formula" or "paragraph";
+# level is the heading level (1 = top) or bullet nesting depth (1 = outermost);
+# spans is a tuple of (text, style) with style "", "bold", "italic" or "code".
+NoteBlock = namedtuple("NoteBlock", ["kind", "level", "spans"])
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*$")
+_BOLD_LINE_PATTERN = re.compile(r"^\*\*([^*]+?)\*\*:?$")
+_BULLET_PATTERN = re.compile(r"^([ \t]*)(?:[-*•+]|(\d+[.)]))\s+(.*)$")
+_DISPLAY_MATH_PATTERN = re.compile(r"^(?:\$\$(.+?)\$\$|\\\[(.+?)\\\])$")
+_INLINE_PATTERN = re.compile(r"\*\*(.+?)\*\*|__(.+?)__|\*(.+?)\*|`(.+?)`")
+_WORD_PATTERN = re.compile(r"[A-Za-z]{4,}")
+
+
+def block_text(block):
+    """Plain text of a block, without inline formatting."""
+    return "".join(text for text, _ in block.spans)
+
+
+def parse_inline(text):
+    """
+    Split a line into styled spans (**bold**, *italic*, `code`).
+
+    Args:
+        text (str): One line of notes
+
+    Returns:
+        tuple: (text, style) pairs
+    """
+    spans = []
+    position = 0
+    for match in _INLINE_PATTERN.finditer(text):
+        if match.start() > position:
+            spans.append((text[position:match.start()], ""))
+        bold, underscored, italic, code = match.groups()
+        if bold is not None or underscored is not None:
+            spans.append((bold if bold is not None else underscored, "bold"))
+        elif italic is not None:
+            spans.append((italic, "italic"))
+        else:
+            spans.append((code, "code"))
+        position = match.end()
+    if position < len(text):
+        spans.append((text[position:], ""))
+    return tuple(spans)
+
+
+def _looks_like_formula(line):
+    # An equation line: has "=" and is mostly symbols and short names, not prose
+    if "=" not in line or line.endswith((".", ":")):
+        return False
+    return len(_WORD_PATTERN.findall(line)) <= 3
+
+
+def _bullet_level(indent, indents):
+    # Nesting follows the indents seen so far in the list, whatever their width
+    width = len(indent.expandtabs(4))
+    while indents and indents[-1] > width:
+        indents.pop()
+    if not indents or indents[-1] < width:
+        indents.append(width)
+    return min(3, len(indents))
+
+
+@lru_cache(maxsize=MAX_CACHED_NOTES)
+def parse_notes(notes):
+    """
+    Parse notes text (Gemini's markdown-like output) into blocks.
+
+    Consecutive prose lines are merged into one paragraph; headings,
+    bullets and formulas each get their own block. Results are cached, so
+    rendering the same notes to several formats parses them once.
+
+    Args:
+        notes (str): Notes text
+
+    Returns:
+        tuple: NoteBlock items in document order
+    """
+    blocks = []
+    paragraph = []
+    indents = []  # Bullet indent widths of the current list, outermost first
+    fence = None
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(NoteBlock("paragraph", 0, parse_inline(" ".join(paragraph))))
+            del paragraph[:]
+
+    for raw_line in notes.splitlines():
+        line = raw_line.strip()
+
+        # Code fences and multi-line display math: every line inside is a formula
+        if fence is not None:
+            if line in (fence, "\\]"):
+                fence = None
+            elif line:
+                blocks.append(NoteBlock("formula", 0, ((line, ""),)))
+            continue
+        if line.startswith("```") or line in ("$$", "\\["):
+            flush_paragraph()
+            fence = "```" if line.startswith("```") else "$$"
+            continue
+
+        if not line:
+            flush_paragraph()
+            continue
+
+        heading = _HEADING_PATTERN.match(line)
+        if heading:
+            flush_paragraph()
+            del indents[:]
+            blocks.append(NoteBlock("heading", len(heading.group(1)), parse_inline(heading.group(2))))
+            continue
+
+        bold_line = _BOLD_LINE_PATTERN.match(line)
+        if bold_line:
+            flush_paragraph()
+            del indents[:]
+            blocks.append(NoteBlock("heading", 2, ((bold_line.group(1).strip(), ""),)))
+            continue
+
+        bullet = _BULLET_PATTERN.match(raw_line)
+        if bullet:
+            flush_paragraph()
+            indent, number, text = bullet.groups()
+            if number:
+                text = f"{number} {text}"
+            blocks.append(NoteBlock("bullet", _bullet_level(indent, indents), parse_inline(text.strip())))
+            continue
+
+        display_math = _DISPLAY_MATH_PATTERN.match(line)
+        if display_math:
+            flush_paragraph()
+            formula = display_math.group(1) or display_math.group(2)
+            blocks.append(NoteBlock("formula", 0, ((formula.strip(), ""),)))
+            continue
+
+        if _looks_like_formula(line):
+            flush_paragraph()
+            blocks.append(NoteBlock("formula", 0, ((line.strip("$ "), ""),)))
+            continue
+
+        # Prose ends the current list
+        del indents[:]
+        paragraph.append(line)
+
+    flush_paragraph()
+    return tuple(blocks)
@@ -0,0 +1,297 @@
+import asyncio
+import random
+import threading
+import time
+from hedging import DeadlineExceededError
+
+# Upstream errors worth retrying, matched by class name so both the
+# google.api_core exceptions and test doubles qualify
+RETRYABLE_ERRORS = frozenset({
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "InternalServerError",
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "TimeoutError",
+    "ConnectionError",
+})
+
+# Retryable errors that mean the upstream rejected the call for quota or timed out
+RATE_LIMIT_ERRORS = frozenset({"ResourceExhausted", "TooManyRequests"})
+TIMEOUT_ERRORS = frozenset({"DeadlineExceeded", "GatewayTimeout", "TimeoutError"})
+
+
+class RateLimitError(Exception):
+    """Raised when the client-side rate limit cannot admit a call in time."""
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the upstream while the circuit is open."""
+
+
+def _is_one_of(error, names):
+    return any(cls.__name__ in names for cls in type(error).__mro__)
+
+
+def is_retryable(error):
+    """
+    Decide whether a failed call is worth retrying.
+
+    Args:
+        error (Exception): The raised error
+
+    Returns:
+        bool: True for rate limits, timeouts and transient server errors
+    """
+    return _is_one_of(error, RETRYABLE_ERRORS)
+
+
+def is_rate_limited(error):
+    """Check whether an upstream error is a quota / rate-limit rejection (HTTP 429)."""
+    return _is_one_of(error, RATE_LIMIT_ERRORS)
+
+
+def is_timeout(error):
+    """Check whether an upstream error is a timeout."""
+    return _is_one_of(error, TIMEOUT_ERRORS)
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Retry number, starting at 0
+        base_delay (float): Delay ceiling for the first retry, in seconds
+        max_delay (float): Largest delay ceiling, in seconds
+
+    Returns:
+        float: Seconds to wait before the retry
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at a per-minute rate."""
+
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = float(self.capacity)
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """
+        Take tokens from the bucket, going into debt if necessary.
+
+        Args:
+            amount (float): Tokens to take (capped at the bucket capacity)
+
+        Returns:
+            float: Seconds the caller must wait before proceeding
+        """
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.tokens -= min(amount, self.capacity)
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def refund(self, amount=1):
+        """Return tokens taken by a reservation that was not used."""
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class RateLimiter:
+    """
+    Client-side limit on requests per minute and tokens per minute.
+
+    Shared by every caller in the process, so concurrent sessions queue
+    locally instead of all hitting the upstream rate limit together.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, max_wait=30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_wait = max_wait
+
+    def _reserve(self, tokens, deadline):
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > self.max_wait or (deadline is not None and time.monotonic() + wait >= deadline):
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            if wait > self.max_wait:
+                raise RateLimitError(f"Rate limit reached; next slot in {wait:.1f}s")
+            raise DeadlineExceededError(f"Rate limit reached; next slot in {wait:.1f}s is past the deadline")
+        return wait
+
+    def acquire(self, tokens=0, deadline=None):
+        """
+        Block until a request of the given size may be sent.
+
+        Args:
+            tokens (int): Approximate tokens the request will use
+            deadline (float): time.monotonic() by which the request must be sent, or None
+
+        Raises:
+            RateLimitError: If the wait would exceed max_wait
+            DeadlineExceededError: If the wait would run past the deadline
+        """
+        wait = self._reserve(tokens, deadline)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=0, deadline=None):
+        """Async variant of acquire()."""
+        wait = self._reserve(tokens, deadline)
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the upstream is unhealthy.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are rejected for reset_timeout seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.state = "closed"
+        self._opened_at = 0.0
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may go to the upstream now.
+
+        Returns:
+            bool: False while the circuit is open
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = self._clock()
+            # Also re-arms a half-open circuit whose trial call never reported back
+            if now - self._opened_at >= self.reset_timeout:
+                self.state = "half-open"
+                self._opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = self._clock()
+
+
+def _check_deadline(deadline, wait=0.0):
+    # Nothing is sent, and no time is spent waiting, for a caller that has given up
+    if deadline is not None and time.monotonic() + wait >= deadline:
+        raise DeadlineExceededError("The request would not finish before its deadline")
+
+
+def call_with_resilience(fn, limiter=None, breaker=None, tokens=0,
+                         max_retries=3, base_delay=1.0, max_delay=20.0, sleep=time.sleep, deadline=None):
+    """
+    Call fn() through the rate limiter and circuit breaker, retrying
+    retryable errors with jittered exponential backoff.
+
+    With a deadline, a rate-limit wait or backoff that would run past it is
+    refused, so an attempt whose caller has given up stops instead of
+    spending quota on an answer nobody reads.
+
+    Args:
+        fn: Zero-argument callable making the upstream request
+        limiter (RateLimiter): Shared rate limiter, or None
+        breaker (CircuitBreaker): Shared circuit breaker, or None
+        tokens (int): Approximate tokens per attempt, for the limiter
+        max_retries (int): Retries after the first attempt
+        base_delay (float): Backoff ceiling for the first retry, in seconds
+        max_delay (float): Largest backoff ceiling, in seconds
+        sleep: Sleep function (replaceable in tests)
+        deadline (float): time.monotonic() after which nothing more is attempted, or None
+
+    Returns:
+        The result of fn()
+
+    Raises:
+        CircuitOpenError: If the circuit is open
+        RateLimitError: If the rate limiter cannot admit the call in time
+        DeadlineExceededError: If the deadline passes before an attempt can be sent
+        Exception: The last error from fn() when it is not retryable or retries run out
+    """
+    for attempt in range(max_retries + 1):
+        _check_deadline(deadline)
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("Upstream is unavailable; not sending the request")
+        if limiter is not None:
+            limiter.acquire(tokens, deadline)
+        try:
+            result = fn()
+        except Exception as e:
+            if not is_retryable(e):
+                # The upstream answered; the problem is the request itself (blocked content, bad input)
+                if breaker is not None:
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            _check_deadline(deadline, delay)
+            sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+
+async def call_with_resilience_async(fn, limiter=None, breaker=None, tokens=0,
+                                     max_retries=3, base_delay=1.0, max_delay=20.0, deadline=None):
+    """
+    Async variant of call_with_resilience(); fn returns an awaitable.
+    """
+    for attempt in range(max_retries + 1):
+        _check_deadline(deadline)
+        if breaker is not None and not breaker.allow():
+            raise CircuitOpenError("Upstream is unavailable; not sending the request")
+        if limiter is not None:
+            await limiter.acquire_async(tokens, deadline)
+        try:
+            result = await fn()
+        except Exception as e:
+            if not is_retryable(e):
+                if breaker is not None:
+                    breaker.record_success()
+                raise
+            if breaker is not None:
+                breaker.record_failure()
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            _check_deadline(deadline, delay)
+            await asyncio.sleep(delay)
+            continue
+        if breaker is not None:
+            breaker.record_success()
+        return result
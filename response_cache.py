@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(model_name, prompt, generation_config=None):
+    """
+    Build a cache key for one model request.
+
+    Args:
+        model_name (str): Name of the model serving the request
+        prompt (str): Full prompt text
+        generation_config (dict): Generation settings (temperature, etc.)
+
+    Returns:
+        str: SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "config": generation_config or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Two-tier cache of model responses.
+
+    A bounded in-memory LRU sits in front of an optional SQLite table whose
+    entries expire after ttl seconds. Safe to share between sessions.
+    """
+
+    def __init__(self, max_entries=256, db_path=None, ttl=7 * 24 * 3600):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+    def _connect(self):
+        # Opened on first use so importing the module never touches the disk
+        if self._db is None and self.db_path:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up a response.
+
+        Args:
+            key (str): Key from make_key()
+
+        Returns:
+            str: Cached response, or None on a miss
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            db = self._connect()
+            if db is not None:
+                row = db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and time.time() - row[1] <= self.ttl:
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    return row[0]
+                if row:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    db.commit()
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """
+        Store a response in both tiers.
+
+        Args:
+            key (str): Key from make_key()
+            value (str): Response text
+        """
+        with self._lock:
+            self._remember(key, value)
+            db = self._connect()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, time.time()),
+                )
+                db.commit()
+
+    def clear(self):
+        """Remove every entry from both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM responses")
+                db.commit()
+
+    def stats(self):
+        """
+        Report cache effectiveness.
+
+        Returns:
+            dict: 'hits', 'misses', 'hit_rate' and 'entries' (in memory)
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": len(self._memory),
+            }
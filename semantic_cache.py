@@ -0,0 +1,214 @@
+import hashlib
+import re
+import threading
+import zlib
+from collections import OrderedDict, namedtuple
+import numpy as np
+from bm25 import STOP_WORDS, TOKEN_PATTERN
+
+# Size of the hashed feature space
+DIMENSIONS = 2 ** 14
+
+# Weight of each character trigram relative to a whole word
+TRIGRAM_WEIGHT = 0.25
+
+# Cosine similarity above which two questions count as the same question
+SIMILARITY_THRESHOLD = 0.8
+
+# Distinct contexts remembered, and questions remembered per context
+MAX_CONTEXTS = 512
+MAX_QUESTIONS_PER_CONTEXT = 64
+
+# Stop words that change what a question asks. Retrieval may ignore them, but
+# two questions only share an answer when they use exactly the same ones.
+INTENT_WORDS = frozenset("""
+why how what when where which who whom not no nor never without before after above
+below more most less least than only until during against between further
+""".split())
+
+# A hashed feature vector stored sparsely: sorted unique int32 feature indices
+# and their float32 weights. A question has tens of features, so this is a few
+# hundred bytes where a dense vector would be DIMENSIONS * 4.
+SparseVector = namedtuple("SparseVector", ["indices", "weights"])
+
+_QUESTION_STOP_WORDS = STOP_WORDS - INTENT_WORDS
+_NEGATION_PATTERN = re.compile(r"n['’]t\b")
+
+
+def question_terms(text):
+    """
+    Split a question into terms, keeping question words and negations.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        list: Term strings ("isn't" becomes "isn", "not")
+    """
+    text = _NEGATION_PATTERN.sub(" not", text.lower())
+    return [t for t in TOKEN_PATTERN.findall(text) if t not in _QUESTION_STOP_WORDS]
+
+
+def intent_signature(text):
+    """
+    The intent words of a question, which must match for an answer to be reused.
+
+    Args:
+        text (str): Question text
+
+    Returns:
+        frozenset: Intent words present in the question
+    """
+    return frozenset(t for t in question_terms(text) if t in INTENT_WORDS)
+
+
+def embed(text, dimensions=DIMENSIONS):
+    """
+    Vectorize a question with hashed word unigrams and character trigrams.
+
+    Stop words other than INTENT_WORDS are dropped so the content words
+    decide the match; trigrams make the vector robust to small rewordings and
+    typos. CRC32 hashing keeps vectors stable across processes without a
+    vocabulary.
+
+    Args:
+        text (str): Question text
+        dimensions (int): Size of the hashed feature space
+
+    Returns:
+        SparseVector: L2-normalised features
+    """
+    features = []
+    weights = []
+    for word in question_terms(text):
+        features.append(zlib.crc32(b"w:" + word.encode("utf-8")) % dimensions)
+        weights.append(1.0)
+        padded = f"<{word}>"
+        for i in range(len(padded) - 2):
+            features.append(zlib.crc32(padded[i:i + 3].encode("utf-8")) % dimensions)
+            weights.append(TRIGRAM_WEIGHT)
+
+    # Sum the weights of features that hash to the same index
+    indices, inverse = np.unique(np.asarray(features, dtype=np.int32), return_inverse=True)
+    vector = np.bincount(inverse, weights=weights, minlength=len(indices)).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return SparseVector(indices.astype(np.int32), vector)
+
+
+def cosine(a, b):
+    """
+    Cosine similarity of two embed() vectors.
+
+    Args:
+        a (SparseVector): First vector
+        b (SparseVector): Second vector
+
+    Returns:
+        float: Similarity between -1 and 1 (0 if either is empty)
+    """
+    _, in_a, in_b = np.intersect1d(a.indices, b.indices, assume_unique=True, return_indices=True)
+    return float(a.weights[in_a] @ b.weights[in_b])
+
+
+def context_fingerprint(context):
+    """
+    Fingerprint the retrieved context an answer was generated from.
+
+    Args:
+        context (str): Prompt context text
+
+    Returns:
+        str: SHA-256 hex digest
+    """
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    Reuse answers for near-duplicate questions asked against the same context.
+
+    Questions are grouped by context fingerprint, so an answer is only reused
+    when the new question retrieved exactly the same lecture and document
+    content, and it must also use the same intent words (why/how, not,
+    before/after...). Contexts are evicted least recently used first.
+    """
+
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, max_contexts=MAX_CONTEXTS,
+                 max_questions=MAX_QUESTIONS_PER_CONTEXT):
+        self.threshold = threshold
+        self.max_contexts = max_contexts
+        self.max_questions = max_questions
+        self.hits = 0
+        self.misses = 0
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, question, fingerprint):
+        """
+        Find a stored answer for a similar question.
+
+        Args:
+            question (str): The new question
+            fingerprint (str): Fingerprint of its retrieved context
+
+        Returns:
+            dict: 'answer', 'source', 'question' and 'similarity', or None
+        """
+        vector = embed(question)
+        intent = intent_signature(question)
+        with self._lock:
+            entry = self._contexts.get(fingerprint)
+            if entry is None or not entry["answers"]:
+                self.misses += 1
+                return None
+
+            self._contexts.move_to_end(fingerprint)
+            # "Is X stable?" and "Is X not stable?" are near-identical vectors with opposite answers
+            similarities = [
+                cosine(stored, vector) if answer["intent"] == intent else -1.0
+                for stored, answer in zip(entry["vectors"], entry["answers"])
+            ]
+            best = max(range(len(similarities)), key=similarities.__getitem__)
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            answer = dict(entry["answers"][best])
+            del answer["intent"]
+            answer["similarity"] = similarities[best]
+            return answer
+
+    def store(self, question, fingerprint, answer, source):
+        """
+        Remember an answer for later near-duplicate questions.
+
+        Args:
+            question (str): The question that was answered
+            fingerprint (str): Fingerprint of its retrieved context
+            answer (str): The generated answer
+            source (str): Source caption shown with the answer
+        """
+        vector = embed(question)
+        with self._lock:
+            entry = self._contexts.get(fingerprint)
+            if entry is None:
+                entry = {"vectors": [], "answers": []}
+                self._contexts[fingerprint] = entry
+            self._contexts.move_to_end(fingerprint)
+
+            entry["vectors"].append(vector)
+            entry["answers"].append({
+                "question": question,
+                "answer": answer,
+                "source": source,
+                "intent": intent_signature(question),
+            })
+            if len(entry["answers"]) > self.max_questions:
+                del entry["vectors"][0]
+                del entry["answers"][0]
+
+            while len(self._contexts) > self.max_contexts:
+                self._contexts.popitem(last=False)
@@ -0,0 +1,83 @@
+import threading
+
+
+class _Call:
+    """One in-flight call and the waiters sharing its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running block and receive the same result (or exception). Once
+    the call finishes the key is forgotten, so later callers run it again.
+    """
+
+    def __init__(self):
+        self.executions = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run fn() once per key among concurrent callers.
+
+        Args:
+            key (str): Identity of the call, e.g. a response cache key
+            fn: Zero-argument callable doing the work
+
+        Returns:
+            The result of fn(), shared with every concurrent caller
+
+        Raises:
+            Exception: Whatever fn() raised, re-raised in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                call.waiters += 1
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self):
+        """
+        Report how many calls were coalesced.
+
+        Returns:
+            dict: 'executions', 'shared' and 'in_flight'
+        """
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "shared": self.shared,
+                "in_flight": len(self._calls),
+            }
@@ -0,0 +1,166 @@
+import io
+import os
+import threading
+import pytest
+from docx import Document
+from reportlab.pdfgen import canvas
+import document_extractor
+
+
+@pytest.fixture(autouse=True)
+def isolated_page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_extractor, "PAGE_CACHE_DIR", str(tmp_path / "pages"))
+    monkeypatch.setattr(document_extractor, "EXTRACTION_CACHE_DIR", str(tmp_path))
+    document_extractor._page_cache.clear()
+    document_extractor._extraction_cache.clear()
+    yield
+    document_extractor._page_cache.clear()
+    document_extractor._extraction_cache.clear()
+
+
+def form_pdf(text):
+    # Every page drawn this way has the content stream "/FormXob.F1 Do"
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    c.beginForm("F1")
+    c.drawString(100, 700, text)
+    c.endForm()
+    c.doForm("F1")
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_same_form_name_different_text_is_not_shared():
+    first = document_extractor.extract_text_from_pdf(io.BytesIO(form_pdf("Alpha lecture")))
+    second = document_extractor.extract_text_from_pdf(io.BytesIO(form_pdf("Beta lecture")))
+    assert "Alpha lecture" in first
+    assert "Beta lecture" in second
+    assert "Alpha" not in second
+
+
+def test_streaming_extraction_uses_the_same_key():
+    document_extractor.extract_text_from_pdf(io.BytesIO(form_pdf("Alpha lecture")))
+    blocks = list(document_extractor.iter_pdf_pages(io.BytesIO(form_pdf("Beta lecture"))))
+    assert "Beta lecture" in blocks[0].text
+
+
+def test_identical_page_is_served_from_cache(monkeypatch):
+    document_extractor.extract_text_from_pdf(io.BytesIO(form_pdf("Alpha lecture")))
+
+    def fail(self, *args, **kwargs):
+        raise AssertionError("page was re-extracted")
+
+    monkeypatch.setattr("PyPDF2._page.PageObject.extract_text", fail)
+    text = document_extractor.extract_text_from_pdf(io.BytesIO(form_pdf("Alpha lecture")))
+    assert "Alpha lecture" in text
+
+
+def many_page_pdf(pages):
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    for page in range(pages):
+        c.drawString(100, 700, f"Lecture page {page + 1}")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("parallel", [False, True])
+def test_streamed_pages_arrive_in_order(parallel, monkeypatch):
+    monkeypatch.setattr(document_extractor, "PAGES_PER_TASK", 3)
+    monkeypatch.setattr(document_extractor, "MAX_WORKERS", 2)
+    data = many_page_pdf(10)
+    # Cache a few pages first so cached and extracted pages interleave
+    list(document_extractor.iter_pdf_pages(io.BytesIO(many_page_pdf(4))))
+
+    blocks = list(document_extractor.iter_pdf_pages(io.BytesIO(data), parallel=parallel))
+    assert [block.page for block in blocks] == list(range(1, 11))
+    assert all(f"Lecture page {block.page}" in block.text for block in blocks)
+
+
+def test_large_uncached_pdf_uses_the_process_pool(monkeypatch):
+    monkeypatch.setattr(document_extractor, "PARALLEL_MIN_PAGES", 4)
+    monkeypatch.setattr(document_extractor, "MAX_WORKERS", 2)
+    submitted = []
+    contexts = []
+    real_pool = document_extractor.ProcessPoolExecutor
+
+    class RecordingPool(real_pool):
+        def __init__(self, *args, **kwargs):
+            contexts.append(kwargs["mp_context"].get_start_method())
+            super().__init__(*args, **kwargs)
+
+        def submit(self, fn, *args):
+            submitted.append(args[0])
+            return super().submit(fn, *args)
+
+    monkeypatch.setattr(document_extractor, "ProcessPoolExecutor", RecordingPool)
+    blocks = list(document_extractor.iter_document_blocks(io.BytesIO(many_page_pdf(8)), "pdf"))
+    assert len(blocks) == 8
+    assert sum(len(batch) for batch in submitted) == 8
+    # Only page numbers go with each task; the PDF goes to each worker once
+    assert all(isinstance(page, int) for batch in submitted for page in batch)
+    assert contexts and contexts[0] != "fork"
+
+
+def test_serial_extraction_digests_pages_as_they_are_reached(monkeypatch):
+    digested = []
+    real_digest = document_extractor.page_digest
+    monkeypatch.setattr(document_extractor, "page_digest",
+                        lambda page, memo=None: digested.append(page) or real_digest(page, memo))
+    pages = document_extractor.iter_pdf_pages(io.BytesIO(many_page_pdf(10)), parallel=False)
+    first = next(pages)
+    assert "Lecture page 1" in first.text
+    assert len(digested) == 1
+    assert len(list(pages)) == 9
+
+
+def docx_with_line_breaks():
+    doc = Document()
+    paragraph = doc.add_paragraph("Definition of a heap")
+    paragraph.add_run().add_break()
+    paragraph.add_run("A complete binary tree")
+    doc.add_paragraph("Heap operations")
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def test_cached_word_paragraphs_keep_their_line_breaks():
+    data = docx_with_line_breaks()
+    first = list(document_extractor.iter_document_blocks(io.BytesIO(data), "docx"))
+    document_extractor._extraction_cache.clear()
+    replayed = list(document_extractor.iter_document_blocks(io.BytesIO(data), "docx"))
+    assert len(first) == 2
+    assert first[0].text == "Definition of a heap\nA complete binary tree"
+    assert [(b.paragraph, b.text) for b in replayed] == [(b.paragraph, b.text) for b in first]
+
+    text, _ = document_extractor.extract_text_from_document(named(data, "notes.docx"), "docx")
+    assert text == "Definition of a heap\nA complete binary tree\nHeap operations"
+
+
+def named(data, name):
+    file = io.BytesIO(data)
+    file.name = name
+    return file
+
+
+def test_concurrent_extractions_of_the_same_file_all_succeed():
+    data = many_page_pdf(3)
+    results, errors = [], []
+
+    def extract():
+        try:
+            results.append(document_extractor.extract_text_from_document(named(data, "notes.pdf"), "pdf")[0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=extract) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(set(results)) == 1 and "Lecture page 3" in results[0]
+    assert not [name for name in os.listdir(document_extractor.EXTRACTION_CACHE_DIR) if name.endswith(".tmp")]
@@ -0,0 +1,113 @@
+import time
+import pytest
+import gemini_chat
+from fake_gemini import FakeGenerativeModel
+from hedging import Hedger
+from resilience import CircuitBreaker, RateLimiter
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    """Route every tier to one FakeGenerativeModel and isolate the shared caches."""
+    def install(**options):
+        options.setdefault("latency", "fixed:0")
+        options.setdefault("chunk_delay", 0)
+        model = FakeGenerativeModel("fake-model", **options)
+        monkeypatch.setattr(gemini_chat, "get_client", lambda tier=None: model)
+        return model
+
+    monkeypatch.setattr(gemini_chat, "response_cache", ResponseCache(db_path=None))
+    monkeypatch.setattr(gemini_chat, "hedger", Hedger())
+    monkeypatch.setattr(gemini_chat, "stream_hedger", Hedger())
+    monkeypatch.setattr(gemini_chat, "circuit_breaker", CircuitBreaker(failure_threshold=1000))
+    monkeypatch.setattr(gemini_chat, "rate_limiter", RateLimiter(10000, 10 ** 9))
+    monkeypatch.setattr(gemini_chat, "RETRY_BASE_DELAY", 0.0)
+    return install
+
+
+def test_stream_returns_the_full_answer(fake_model):
+    fake_model(answer_words=40, chunk_words=5)
+    stream = gemini_chat.gemini_chat_stream("What is a stack?", tier="light")
+    chunks = list(stream)
+    assert len(chunks) > 1
+    assert "".join(chunks).strip() == stream.text
+    assert not stream.failed
+
+
+def test_stream_times_out_waiting_for_the_first_chunk(fake_model):
+    fake_model(latency="fixed:0.5")
+    stream = gemini_chat.gemini_chat_stream("What is a queue?", tier="light", timeout=0.05, hedge=False)
+    assert list(stream) == [gemini_chat.TIMEOUT_MESSAGE]
+    assert stream.failed
+
+
+def test_slow_stream_open_is_hedged(fake_model, monkeypatch):
+    model = fake_model(latency="fixed:0.01")
+    hedger = Hedger(min_samples=1, min_delay=0.01, max_fraction=1.0)
+    monkeypatch.setattr(gemini_chat, "stream_hedger", hedger)
+    list(gemini_chat.gemini_chat_stream("warm up", tier="light", use_cache=False))
+
+    # The first attempt stalls; the backup attempt answers at the usual speed
+    calls = []
+    original = model.generate_content
+
+    def first_attempt_stalls(prompt, stream=False):
+        calls.append(prompt)
+        if len(calls) == 1:
+            time.sleep(1.0)
+        return original(prompt, stream=stream)
+
+    model.generate_content = first_attempt_stalls
+    stream = gemini_chat.gemini_chat_stream("What is a heap?", tier="light", use_cache=False, timeout=0.5)
+    assert not gemini_chat.is_error_reply("".join(stream))
+    assert len(calls) == 2
+    assert hedger.budget.hedges == 1
+
+
+def test_request_timeout_is_passed_upstream(fake_model):
+    model = fake_model(latency="fixed:0.5")
+    start = time.monotonic()
+    reply = gemini_chat.gemini_chat("What is a deque?", tier="light", timeout=0.1, hedge=False)
+    assert reply == gemini_chat.TIMEOUT_MESSAGE
+    # The abandoned attempt ends at the deadline instead of running on in the background
+    time.sleep(0.15)
+    assert model.calls == 1
+    assert time.monotonic() - start < 0.5
+
+
+def test_attempt_queued_past_the_deadline_is_never_sent(fake_model, monkeypatch):
+    model = fake_model()
+    limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=10 ** 9, max_wait=60)
+    monkeypatch.setattr(gemini_chat, "rate_limiter", limiter)
+    gemini_chat.gemini_chat("q1", tier="light")
+    gemini_chat.gemini_chat("q2", tier="light")
+    reply = gemini_chat.gemini_chat("q3", tier="light", timeout=0.2, hedge=False)
+    assert reply == gemini_chat.TIMEOUT_MESSAGE
+    assert model.calls == 2
+    # The refused reservation was refunded
+    assert limiter.requests.tokens > -1
+
+
+def test_exhausted_rate_limit_retries_show_the_busy_message(fake_model):
+    model = fake_model()
+    reply = gemini_chat.gemini_chat("What is a trie? [[fake:rate_limited]]", tier="light")
+    assert reply == gemini_chat.BUSY_MESSAGE
+    assert model.calls == gemini_chat.MAX_RETRIES + 1
+
+
+def test_blocked_and_empty_responses_show_the_empty_message(fake_model):
+    fake_model()
+    assert gemini_chat.gemini_chat("q [[fake:blocked]]", tier="light") == gemini_chat.EMPTY_RESPONSE_MESSAGE
+    assert gemini_chat.gemini_chat("q [[fake:empty]]", tier="light") == gemini_chat.EMPTY_RESPONSE_MESSAGE
+
+
+def test_error_replies_for_exhausted_transient_errors():
+    class ServiceUnavailable(Exception):
+        pass
+
+    class DeadlineExceeded(Exception):
+        pass
+
+    assert gemini_chat._error_reply(ServiceUnavailable("503")) == gemini_chat.UNAVAILABLE_MESSAGE
+    assert gemini_chat._error_reply(DeadlineExceeded("504")) == gemini_chat.TIMEOUT_MESSAGE
@@ -0,0 +1,100 @@
+import os
+import pytest
+import lecture_index
+from bm25 import BM25Index, count_terms, intern_terms, tokenize
+from document_extractor import ExtractedBlock
+from lecture_index import DocumentIndex, LectureIndex
+from context_packer import pack_context
+
+
+def page_blocks(pages):
+    return [
+        ExtractedBlock(page, None, f"Section {page} covers dynamic programming topic {page}. " * 5)
+        for page in range(1, pages + 1)
+    ]
+
+
+def test_matching_question_returns_ranked_hits():
+    index = DocumentIndex.build("notes.pdf", page_blocks(3) + [ExtractedBlock(4, None, "Dijkstra shortest paths")])
+    results = index.search("Dijkstra", top_k=5)
+    assert results[0]["label"] == "notes.pdf, page 4"
+
+
+def test_generic_question_falls_back_to_the_whole_small_document():
+    index = DocumentIndex.build("notes.pdf", page_blocks(3))
+    results = index.search("Summarize this document", top_k=20)
+    assert [r["label"] for r in results] == [f"notes.pdf, page {p}" for p in (1, 2, 3)]
+
+
+def test_generic_question_samples_a_large_document_evenly():
+    index = DocumentIndex.build("notes.pdf", page_blocks(50))
+    results = index.search("Summarize this document", top_k=5)
+    assert [r["label"] for r in results] == [f"notes.pdf, page {p}" for p in (1, 13, 25, 38, 50)]
+    scores = [r["score"] for r in results]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_fallback_keeps_the_earliest_chunks_within_budget():
+    index = DocumentIndex.build("notes.pdf", page_blocks(50))
+    packed = pack_context({"document": index.search("Summarize this document", top_k=20)}, {"document": 300})
+    kept = [item["label"] for item in packed["sections"]["document"]]
+    assert kept and kept[0] == "notes.pdf, page 1"
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+@pytest.fixture
+def lectures(tmp_path):
+    subject = tmp_path / "cloud" / "daa"
+    subject.mkdir(parents=True)
+    for name, topic in [("sorting", "merge sort quicksort heapsort"), ("graphs", "dijkstra shortest paths"),
+                        ("dp", "knapsack memoization")]:
+        write(subject / f"{name}.txt", f"Lecture on {topic}. " * 60)
+    return tmp_path
+
+
+def test_shard_refresh_reads_only_changed_files(lectures, monkeypatch):
+    index = LectureIndex(str(lectures / "cloud"), str(lectures / "index"))
+    assert index.search("dijkstra")[0]["source"].endswith("graphs.txt")
+
+    read = []
+    original = lecture_index._read_chunks
+    monkeypatch.setattr(lecture_index, "_read_chunks", lambda path: read.append(path) or original(path))
+    changed = str(lectures / "cloud" / "daa" / "dp.txt")
+    write(changed, "Lecture on bellman ford relaxation. " * 60)
+    index.mark_dirty(changed)
+
+    assert index.search("bellman")[0]["source"] == changed
+    assert index.search("knapsack") == []
+    assert read == [changed]
+
+
+def test_shard_reloads_from_per_file_snapshots(lectures, monkeypatch):
+    LectureIndex(str(lectures / "cloud"), str(lectures / "index")).search("heapsort")
+    assert len(os.listdir(lectures / "index" / "daa")) == 3
+
+    monkeypatch.setattr(lecture_index, "_read_chunks", lambda path: pytest.fail(f"re-read {path}"))
+    results = LectureIndex(str(lectures / "cloud"), str(lectures / "index")).search("heapsort")
+    assert results[0]["source"].endswith("sorting.txt")
+
+
+def test_merged_postings_score_like_an_incremental_index():
+    groups = [["merge sort is stable", "quicksort is not stable"], ["heap sort uses a heap", "sort"]]
+    incremental = BM25Index()
+    for group in groups:
+        for text in group:
+            incremental.add(text)
+    vocab = {}
+    parts = []
+    for group in groups:
+        postings = count_terms([tokenize(text) for text in group])
+        parts.append((postings, intern_terms(postings, vocab)))
+    merged = BM25Index.from_postings(parts, vocab)
+
+    for query in ("sort", "stable heap", "quicksort merge"):
+        expected = incremental.search(query)
+        assert [doc for doc, _ in merged.search(query)] == [doc for doc, _ in expected]
+        assert [score for _, score in merged.search(query)] == pytest.approx([score for _, score in expected])
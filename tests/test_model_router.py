@@ -0,0 +1,51 @@
+import pytest
+from context_packer import DEFAULT_BUDGETS, format_section, pack_context
+from model_router import LIGHT_MAX_CONTEXT_TOKENS, route
+
+CHUNK = ("A stack is a last in first out collection; push adds an element to the top "
+         "and pop removes the most recently added element, both in constant time. ") * 7
+
+
+def chat_prompt(question, context):
+    # The shape of the prompt app.py builds for a chat question
+    return f"""
+You are Classroom AI.
+
+Answer the question STRICTLY using the content provided below.
+If the answer is not present or insufficient in the provided content, you may use general knowledge.
+Use the conversation so far only to understand what the question refers to.
+
+AVAILABLE CONTENT:
+{context}
+
+QUESTION:
+{question}
+"""
+
+
+def full_chat_context():
+    candidates = [{"label": f"lecture{i}.txt", "text": CHUNK, "score": 1.0 / (i + 1)} for i in range(20)]
+    packed = pack_context({"document": candidates, "lectures": candidates})
+    assert packed["tokens"]["lectures"] > DEFAULT_BUDGETS["lectures"] * 0.8
+    sections = packed["sections"]
+    return (f"UPLOADED DOCUMENT: notes.pdf\n{format_section(sections['document'])}\n\n"
+            f"CLASSROOM LECTURES:\n{format_section(sections['lectures'])}")
+
+
+def test_simple_chat_question_with_full_budgets_routes_light():
+    context = full_chat_context()
+    decision = route(chat_prompt("What is a stack?", context), "What is a stack?", context)
+    assert decision.tier == "light"
+
+
+@pytest.mark.parametrize("question", ["Explain how a stack works", "Compare stacks and queues"])
+def test_complex_chat_question_routes_heavy(question):
+    context = full_chat_context()
+    assert route(chat_prompt(question, context), question, context).tier == "heavy"
+
+
+def test_context_beyond_the_budgets_routes_heavy():
+    context = CHUNK * (LIGHT_MAX_CONTEXT_TOKENS // 100)
+    decision = route(chat_prompt("What is a stack?", context), "What is a stack?", context)
+    assert decision.tier == "heavy"
+    assert "context" in decision.reason or "prompt" in decision.reason
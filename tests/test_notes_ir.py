@@ -0,0 +1,27 @@
+import pytest
+from notes_ir import block_text, parse_notes
+
+
+def bullet_levels(notes):
+    return [(block_text(b), b.level) for b in parse_notes(notes) if b.kind == "bullet"]
+
+
+@pytest.mark.parametrize("indent", ["  ", "    ", "\t"])
+def test_nesting_follows_the_indents_used(indent):
+    notes = f"- a\n{indent}- b\n{indent * 2}- c\n{indent}- d\n- e"
+    assert bullet_levels(notes) == [("a", 1), ("b", 2), ("c", 3), ("d", 2), ("e", 1)]
+
+
+def test_indented_first_bullet_is_top_level():
+    assert bullet_levels("   * a\n      * b") == [("a", 1), ("b", 2)]
+
+
+def test_new_list_after_prose_starts_at_top_level():
+    notes = "- a\n    - b\n\nSome prose.\n    - c"
+    assert bullet_levels(notes) == [("a", 1), ("b", 2), ("c", 1)]
+
+
+def test_blocks_and_inline_spans():
+    blocks = parse_notes("## Summary\nMerge sort is **stable**.\n\nT(n) = 2T(n/2) + O(n)\n$$a^2 + b^2 = c^2$$")
+    assert [b.kind for b in blocks] == ["heading", "paragraph", "formula", "formula"]
+    assert ("stable", "bold") in blocks[1].spans
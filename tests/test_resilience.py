@@ -0,0 +1,184 @@
+import time
+import pytest
+from fake_gemini import FakeGenerativeModel, ResourceExhausted
+from hedging import DeadlineExceededError
+from resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimiter,
+    RateLimitError,
+    TokenBucket,
+    call_with_resilience,
+    is_retryable,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ServiceUnavailable(Exception):
+    pass
+
+
+def failing(times, error=ServiceUnavailable, result="ok"):
+    """A call that raises error the first `times` calls, then returns result."""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= times:
+            raise error("upstream failed")
+        return result
+
+    call.calls = calls
+    return call
+
+
+def test_breaker_opens_after_threshold_and_recovers_through_half_open():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30, clock=clock)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    clock.advance(30)
+    assert breaker.allow()
+    assert breaker.state == "half-open"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_call_reopens_the_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_retryable_errors_are_retried_with_backoff():
+    sleeps = []
+    call = failing(2)
+    assert call_with_resilience(call, max_retries=3, base_delay=1, max_delay=20, sleep=sleeps.append) == "ok"
+    assert len(call.calls) == 3
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_exhausted_retries_raise_the_last_error():
+    sleeps = []
+    call = failing(10)
+    with pytest.raises(ServiceUnavailable):
+        call_with_resilience(call, max_retries=2, sleep=sleeps.append)
+    assert len(call.calls) == 3
+
+
+def test_non_retryable_errors_are_not_retried_and_do_not_trip_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1)
+    call = failing(1, error=ValueError)
+    with pytest.raises(ValueError):
+        call_with_resilience(call, breaker=breaker, sleep=lambda s: None)
+    assert len(call.calls) == 1
+    assert breaker.state == "closed"
+
+
+def test_open_breaker_fails_fast_without_calling():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60, clock=FakeClock())
+    call = failing(10)
+    # The second failure opens the circuit, so the third attempt never goes out
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(call, breaker=breaker, max_retries=5, sleep=lambda s: None)
+    assert len(call.calls) == 2
+    with pytest.raises(CircuitOpenError):
+        call_with_resilience(call, breaker=breaker, sleep=lambda s: None)
+    assert len(call.calls) == 2
+
+
+def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=60, clock=clock)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    clock.advance(2)
+    assert bucket.reserve(1) == 0.0
+
+
+def test_rate_limiter_rejects_long_waits_and_refunds():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000, max_wait=5)
+    limiter.acquire()
+    with pytest.raises(RateLimitError):
+        limiter.acquire()
+    # The rejected reservation was refunded, so the debt is one request, not two
+    assert limiter.requests.tokens > -1
+
+
+def test_rate_limiter_refuses_waits_past_the_deadline_and_refunds():
+    limiter = RateLimiter(requests_per_minute=1, tokens_per_minute=1000, max_wait=120)
+    limiter.acquire()
+    with pytest.raises(DeadlineExceededError):
+        limiter.acquire(deadline=time.monotonic() + 5)
+    assert limiter.requests.tokens > -1
+
+
+def test_backoff_past_the_deadline_stops_retrying():
+    sleeps = []
+    call = failing(10)
+    with pytest.raises(DeadlineExceededError):
+        call_with_resilience(call, max_retries=5, base_delay=100, max_delay=100,
+                             sleep=sleeps.append, deadline=time.monotonic() + 0.01)
+    # Unless the jitter drew a near-zero delay, nothing is retried
+    assert len(call.calls) == len(sleeps) + 1
+
+
+def test_nothing_is_sent_after_the_deadline():
+    call = failing(0)
+    with pytest.raises(DeadlineExceededError):
+        call_with_resilience(call, deadline=time.monotonic() - 1)
+    assert call.calls == []
+
+
+def test_fake_model_rate_limits_are_retried_until_success():
+    model = FakeGenerativeModel("fake", latency="fixed:0", rate_limit_rate=0.5, seed=3, sleep=lambda s: None)
+    for i in range(10):
+        response = call_with_resilience(lambda: model.generate_content(f"question {i}"),
+                                        max_retries=20, sleep=lambda s: None)
+        assert response.text
+    assert model.calls > 10
+
+
+def test_fake_model_permanent_rate_limit_exhausts_retries():
+    model = FakeGenerativeModel("fake", latency="fixed:0", rate_limit_rate=1.0, sleep=lambda s: None)
+    with pytest.raises(ResourceExhausted) as raised:
+        call_with_resilience(lambda: model.generate_content("question"), max_retries=3, sleep=lambda s: None)
+    assert is_retryable(raised.value)
+    assert model.calls == 4
+
+
+def test_fake_model_failure_rates_are_deterministic():
+    def outcomes(seed):
+        model = FakeGenerativeModel("fake", latency="fixed:0", block_rate=0.2, empty_rate=0.2,
+                                    rate_limit_rate=0.2, seed=seed, sleep=lambda s: None)
+        result = []
+        for i in range(50):
+            try:
+                result.append("ok" if model.generate_content(f"q{i}").parts else "empty")
+            except ResourceExhausted:
+                result.append("429")
+        return result
+
+    first = outcomes(7)
+    assert first == outcomes(7)
+    assert {"ok", "empty", "429"} <= set(first)
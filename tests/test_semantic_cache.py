@@ -0,0 +1,45 @@
+import pytest
+from semantic_cache import SemanticCache, context_fingerprint, cosine, embed, intent_signature
+
+FINGERPRINT = context_fingerprint("CLASSROOM LECTURES:\nSorting algorithms")
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Is quicksort stable?", "Is quicksort not stable?"),
+    ("Is quicksort stable?", "Isn't quicksort stable?"),
+    ("Why is merge sort stable?", "How is merge sort stable?"),
+    ("What happens before a deadlock?", "What happens after a deadlock?"),
+    ("Which sort is most efficient?", "Which sort is least efficient?"),
+])
+def test_questions_differing_in_intent_words_do_not_share_answers(stored, asked):
+    cache = SemanticCache()
+    cache.store(stored, FINGERPRINT, "stored answer", "📘 Source: Classroom Lectures")
+    assert cache.lookup(asked, FINGERPRINT) is None
+
+
+def test_rewording_still_hits():
+    cache = SemanticCache()
+    cache.store("Why is merge sort stable?", FINGERPRINT, "stored answer", "📘 Source: Classroom Lectures")
+    hit = cache.lookup("why is the merge sort algorithm stable", FINGERPRINT)
+    assert hit is not None
+    assert hit["answer"] == "stored answer"
+    assert "intent" not in hit
+
+
+def test_intent_words_reach_the_embedding():
+    assert cosine(embed("Why is merge sort stable?"), embed("How is merge sort stable?")) < 1.0
+    assert intent_signature("Is quicksort not stable?") == {"not"}
+
+
+def test_vectors_are_sparse():
+    vector = embed("Why is merge sort stable?")
+    assert vector.indices.nbytes + vector.weights.nbytes < 1024
+    assert list(vector.indices) == sorted(set(vector.indices))
+    assert cosine(vector, vector) == pytest.approx(1.0)
+    assert cosine(vector, embed("")) == 0.0
+
+
+def test_different_context_misses():
+    cache = SemanticCache()
+    cache.store("Is quicksort stable?", FINGERPRINT, "stored answer", "src")
+    assert cache.lookup("Is quicksort stable?", context_fingerprint("other")) is None